@@ -40,7 +40,7 @@ def create_new_card(args: dict):
     return response
 
 
-def fetch_weekly_task_estimates(args: dict):
+def fetch_weekly_tasks(args: dict):
     user_profile_pk = args.get("user_profile_pk")
     workforce_id = args.get("workforce_id")
 
@@ -54,12 +54,24 @@ def fetch_weekly_task_estimates(args: dict):
     }
 
     response = TaskAssignments.objects.filter(payload)
-    estimates = None
+    tasks = []
 
     try:
-        task_names = [
-            item["task"]["title"] for item in response["data"]]
+        tasks = [
+            {"id": item["task"].get("id"), "title": item["task"]["title"]} for item in response["data"]]
+
+    except Exception as e:
+        print(f"Something went wrong! {e}")
+
+    return tasks
+
+
+def fetch_similar_task_estimates(args: dict):
+    user_profile_pk = args.get("user_profile_pk")
+    task_names = args.get("task_names")
+    estimates = None
 
+    try:
         if task_names:
             estimate_parameters = {
                 "user_profile_pk": user_profile_pk,
@@ -71,10 +83,45 @@ def fetch_weekly_task_estimates(args: dict):
     except Exception as e:
         print(f"Something went wrong! {e}")
 
-    # Output response
     return estimates
 
 
+def fetch_weekly_task_estimates(args: dict):
+    tasks = fetch_weekly_tasks(args)
+
+    # Output response
+    return fetch_similar_task_estimates({
+        "user_profile_pk": args.get("user_profile_pk"),
+        "task_names": [task["title"] for task in tasks]
+    })
+
+
+def fetch_completed_tasks(args: dict):
+    user_profile_pk = args.get("user_profile_pk")
+    workforce_id = args.get("workforce_id")
+
+    payload = {
+        "search_key": "",
+        "is_completed": "True",
+        "sort_field": "-task__date_created",
+        "size_per_request": str(args.get("size_per_request", 500)),
+        "assignee_id": user_profile_pk,
+        "workforce_id": workforce_id
+    }
+
+    response = TaskAssignments.objects.filter(payload)
+    tasks = []
+
+    try:
+        tasks = [
+            {"name": item["task"]["title"], "duration": item.get("total_duration")} for item in response["data"]]
+
+    except Exception as e:
+        print(f"Something went wrong! {e}")
+
+    return tasks
+
+
 def fetch_tasks_due(args: dict):
     user_profile_pk = args.get("user_profile_pk")
     workforce_id = args.get("workforce_id")
@@ -1,15 +1,17 @@
+import uuid
 from typing import Literal
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
-from langchain_core.messages import SystemMessage, merge_message_runs
+from langchain_core.messages import AIMessage, SystemMessage, merge_message_runs
 from langgraph.graph import StateGraph, START, END, MessagesState
-from trustcall import create_extractor
+from utils.trustcall import extract_structured
 
 from api.bposeats import create_new_card
 from utils.configuration import Configuration
-from utils.schemas import CardState, Card
+from utils.schemas import CardState, Card, CardTurn
 from utils.nodes import tool_handler, input_helper
-from utils.models import models
+from utils.models import SilentHandler, get_bound_model, get_structured_model, prebind_models, resolve_model
+from utils.prompts import build_system_message
 
 # import settings
 
@@ -53,28 +55,31 @@ def continue_to_tool(state: MessagesState) -> Literal["create_card_tool_handler"
     return "input_helper"
 
 
+def select_card_turn(state: CardState, config: RunnableConfig) -> Literal["card_extractor_helper",
+                                                                        "card_turn_agent"]:
+    """Determine how the user's response is handled depending on `card_turn_mode`."""
+
+    configuration = Configuration.from_runnable_config(config)
+    if configuration.card_turn_mode == "single_call":
+        return "card_turn_agent"
+
+    return "card_extractor_helper"
+
+
 def card_extractor_helper(state: CardState, config: RunnableConfig) -> CardState:
     """Handles in extracting Card information from user responses"""
 
     configurable = Configuration.from_runnable_config(config)
-    model_name = configurable.model_name
+    model_name = resolve_model("card_extractor", configurable)
     user_profile_pk = configurable.user_profile_pk
-    tool_name = "Card"
 
     card_details = state.get("card_details", None)
 
-    detail_extractor = create_extractor(
-        models[model_name],
-        tools=[Card],
-        tool_choice=tool_name,
-        enable_inserts=True,
-        enable_deletes=True
-    )
-
-    FORMATTED_EXTRACTOR_MESSAGE = EXTRACTOR_MESSAGE.format(user_profile_pk=user_profile_pk)
+    system_message = build_system_message(
+        EXTRACTOR_MESSAGE, USER_PROFILE_MESSAGE.format(user_profile_pk=user_profile_pk))
 
     merged_messages = list(merge_message_runs(
-            messages=[SystemMessage(content=FORMATTED_EXTRACTOR_MESSAGE)] + state["messages"]
+            messages=[system_message] + state["messages"]
     ))
 
     # TODO: Implement extracting specific Board/Column of user
@@ -82,12 +87,28 @@ def card_extractor_helper(state: CardState, config: RunnableConfig) -> CardState
     #       and on the To Do column specifically. Can also extend
     #       this to card creation on different Workforces
 
-    result = detail_extractor.invoke({"messages": merged_messages, "existing": {tool_name: card_details}})
-    extracted_card_details = result["responses"][0]
+    extracted_card_details = extract_structured(
+        model_name,
+        Card,
+        merged_messages,
+        existing=card_details,
+        enable_inserts=True,
+        enable_deletes=True
+    )
 
     return {"card_details": extracted_card_details}
 
 
+def card_creation_outcome(state: CardState) -> str:
+    """Summarizes the result of the subgraph for the parent graph."""
+
+    last_message = state["messages"][-1]
+    if isinstance(last_message, SystemMessage):
+        return last_message.content
+
+    return CANCELLED_MESSAGE.format(card_details=state.get("card_details", None))
+
+
 def card_agent(state: CardState, config: RunnableConfig) -> CardState:
     """
         Facilitates the Board Card creation process by responding to the user and
@@ -95,19 +116,52 @@ def card_agent(state: CardState, config: RunnableConfig) -> CardState:
     """
 
     configuration = Configuration.from_runnable_config(config)
-    model_name = configuration.model_name
-    model = models[model_name]
-    card_agent_model = model.bind_tools(node_tools, parallel_tool_calls=False)
+    model_name = resolve_model("card_agent", configuration)
+    card_agent_model = get_bound_model(model_name, node_tools, parallel_tool_calls=False)
 
     card_details = state.get("card_details", None)
-    FORMATTED_MESSAGE = AGENT_SYSTEM_MESSAGE.format(card_details=card_details)
+    system_message = build_system_message(
+        AGENT_SYSTEM_MESSAGE, CARD_DETAILS_MESSAGE.format(card_details=card_details))
 
-    response = card_agent_model.invoke(
-        [SystemMessage(content=FORMATTED_MESSAGE)] + state["messages"])
+    response = card_agent_model.invoke([system_message] + state["messages"])
 
     return {"messages": [response]}
 
 
+def card_turn_agent(state: CardState, config: RunnableConfig) -> CardState:
+    """
+        Extracts the Card details, responds to the user and decides on the next action
+        in a single structured model call. Replaces `card_extractor_helper` followed by
+        `card_agent` when `card_turn_mode` is "single_call".
+    """
+
+    configuration = Configuration.from_runnable_config(config)
+    model_name = resolve_model("card_turn_agent", configuration)
+    user_profile_pk = configuration.user_profile_pk
+    card_turn_model = get_structured_model(model_name, CardTurn, method="function_calling")
+
+    card_details = state.get("card_details", None)
+    system_message = build_system_message(
+        CARD_TURN_MESSAGE,
+        CARD_DETAILS_MESSAGE.format(card_details=card_details) + "\n\n"
+        + USER_PROFILE_MESSAGE.format(user_profile_pk=user_profile_pk)
+    )
+
+    # The structured output is not meant for the user, only the reply is sent back
+    result = card_turn_model.invoke(
+        [system_message] + state["messages"],
+        config={"callbacks": [SilentHandler()]})
+
+    tool_calls = []
+    if result.action != "continue":
+        tool_calls.append({"name": result.action, "args": {}, "id": str(uuid.uuid4()), "type": "tool_call"})
+
+    return {
+        "card_details": result.card,
+        "messages": [AIMessage(content=result.reply, tool_calls=tool_calls)]
+    }
+
+
 def card_creation_caller_node(state: CardState, config: RunnableConfig) -> CardState:
     """Attempts to create a Card by calling an API endpoint"""
 
@@ -141,7 +195,7 @@ EXTRACTOR_MESSAGE = (
     "Your only job is to extract details from the current conversation to aid in creating "
     "cards. You will be required to follow specific steps for each field on the Card model:\n\n"
     "  1. title (str) - this can be anything the user says.\n"
-    "  2. creator (str) - this is the current user's UserProfile PK which is {user_profile_pk}.\n"
+    "  2. creator (str) - this is the current user's UserProfile PK shown at the end of these instructions.\n"
     "  3. assignees (list[str]) - if the user assigns it to themselves, use their UserProfile PK, else"
     " you can leave it blank. For example: ['15434'].\n"
     "  4. is_public (boolean) - return true if the user wants the card to be publicly available else false.\n"
@@ -157,6 +211,11 @@ API_RESPONSE_MESSAGE = (
     "as if you were the one that created the card for the user."
 )
 
+CANCELLED_MESSAGE = (
+    "The user cancelled the card creation process. The card was not created. "
+    "Details gathered before cancelling: {card_details}."
+)
+
 AGENT_SYSTEM_MESSAGE = (
     "# SYSTEM INSTRUCTIONS:\n"
     "You are an Assistant AI that is tasked on creating Board Cards for the user. "
@@ -171,15 +230,52 @@ AGENT_SYSTEM_MESSAGE = (
     "reiterate everything and confirm with the user that this is correct.\n"
     "  5. When the user says that it's correct or confirms, call `finish_process` to "
     "end the creation process.\n\n"
-    "Below is also the current state of Card, use it as a reference for the rules above:\n"
-    "<details> {card_details} <details>\n\n"
+    "The current state of the Card is shown at the end of these instructions, use it as a "
+    "reference for the rules above.\n\n"
     "Lastly, if the user does not want to continue, call `cancel_process` to end the "
     "creation process."
 )
 
+CARD_TURN_MESSAGE = (
+    "# SYSTEM INSTRUCTIONS:\n"
+    "You are an Assistant AI that is tasked on creating Board Cards for the user. On each turn, "
+    "you must update the Card with the details given by the user, reply to the user and decide "
+    "on the next action.\n\n"
+    "## UPDATING THE CARD\n"
+    "  1. title (str) - this can be anything the user says.\n"
+    "  2. creator (str) - this is the current user's UserProfile PK shown at the end of these instructions.\n"
+    "  3. assignees (list[str]) - if the user assigns it to themselves, use their UserProfile PK, else"
+    " you can leave it blank. For example: ['15434'].\n"
+    "  4. is_public (boolean) - true if the user wants the card to be publicly available else false.\n"
+    "  5. column (str) - this always defaults to '213'.\n"
+    "Keep the values of the current Card unless the user changes them.\n\n"
+    "## REPLYING TO THE USER\n"
+    "Follow the instructions one-by-one, do not immediately ask the user everything at once.\n"
+    "  1. Ask the user for the card's title.\n"
+    "  2. Ask the user if they want to assign it to themselves or just leave it without "
+    "assignees.\n"
+    "  3. Ask them if they would like to make the card visible for everyone.\n"
+    "  4. Once the 'title', 'assignee', and 'is_public' have been asked, make sure to "
+    "reiterate everything and confirm with the user that this is correct.\n\n"
+    "## NEXT ACTION\n"
+    "  - Use `finish_process` when the user says that the Card is correct or confirms.\n"
+    "  - Use `cancel_process` if the user does not want to continue.\n"
+    "  - Use `continue` otherwise.\n\n"
+    "The current state of the Card is shown at the end of these instructions."
+)
+
+# Dynamic parts of the system messages, always placed after the instructions
+USER_PROFILE_MESSAGE = "Current user's UserProfile PK: {user_profile_pk}"
+
+CARD_DETAILS_MESSAGE = (
+    "Current state of the Card:\n"
+    "<details> {card_details} <details>"
+)
+
 
 agent_tools = []
 node_tools = [finish_process, cancel_process]
+prebind_models(node_tools, parallel_tool_calls=False)
 
 
 subgraph_builder = StateGraph(CardState, config_schema=Configuration)
@@ -187,6 +283,7 @@ subgraph_builder = StateGraph(CardState, config_schema=Configuration)
 subgraph_builder.add_node(card_agent)
 subgraph_builder.add_node(input_helper)
 subgraph_builder.add_node(card_extractor_helper)
+subgraph_builder.add_node(card_turn_agent)
 subgraph_builder.add_node(card_creation_caller_node)
 subgraph_builder.add_node("create_card_tool_handler", tool_handler)
 subgraph_builder.add_node("initial_tool_handler", tool_handler)
@@ -195,7 +292,8 @@ subgraph_builder.add_node("cancel_tool_handler", tool_handler)
 subgraph_builder.add_edge(START, "initial_tool_handler")
 subgraph_builder.add_edge("initial_tool_handler", "card_agent")
 subgraph_builder.add_conditional_edges("card_agent", continue_to_tool)
-subgraph_builder.add_edge("input_helper", "card_extractor_helper")
+subgraph_builder.add_conditional_edges("input_helper", select_card_turn)
+subgraph_builder.add_conditional_edges("card_turn_agent", continue_to_tool)
 subgraph_builder.add_edge("card_extractor_helper", "card_agent")
 subgraph_builder.add_edge("create_card_tool_handler", "card_creation_caller_node")
 subgraph_builder.add_edge("cancel_tool_handler", END)
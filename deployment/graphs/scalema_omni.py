@@ -1,10 +1,10 @@
 # Import general libraries
+import time
 from typing import Literal
-from datetime import datetime
 
 # Import Langgraph
 from langgraph.graph import StateGraph, MessagesState, START, END
-from langchain_core.messages import SystemMessage, merge_message_runs
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 from langgraph.checkpoint.postgres import PostgresSaver
@@ -14,7 +14,16 @@ from langgraph.pregel import RetryPolicy
 
 # Import utility functions
 from utils.configuration import Configuration
-from utils.models import models
+from utils.models import get_bound_model, prebind_models, resolve_model
+from utils.context import assemble_context
+from utils.hedging import hedged_invoke
+from utils.intents import IntentRouter
+from utils.metrics import log_metrics
+from utils.tool_selection import select_tools
+from utils.semantic_cache import cacheable_query, lookup_response, save_response, record_model_call
+from utils.prompts import build_system_message, coarse_timestamp
+from utils.nodes import private_subgraph
+from utils.tool_outputs import compacting_tool_node
 from settings import POSTGRES_URI
 from tools.scalema_omni import (
     MemoryState,
@@ -26,8 +35,8 @@ from utils.navigation import get_navigation_links
 from utils.tasks import fetch_most_urgent_task, fetch_tasks_to_complete_this_week
 
 # Import subgraphs
-from graphs.scalema_web3 import scalema_web3_subgraph
-from graphs.card_creator import bposeats_card_creator_subgraph
+from graphs.scalema_web3 import scalema_web3_subgraph, proposal_outcome
+from graphs.card_creator import bposeats_card_creator_subgraph, card_creation_outcome
 from graphs.initialization import init_graph
 
 
@@ -51,7 +60,8 @@ def continue_to_tool(state: MessagesState) -> Literal[
                                                 "memory_executor",
                                                 "__end__"]:
     """
-        Decide on which tool to use
+        Decide on which tool to use. Several tool calls only reach this point when
+        they are all read-only and handled by the same executor.
         @TODO: Transfer to a handoff_tool
         https://langchain-ai.github.io/langgraph/how-tos/agent-handoffs/#implement-a-handoff-tool
     """
@@ -61,7 +71,12 @@ def continue_to_tool(state: MessagesState) -> Literal[
     if not (hasattr(last_message, "tool_calls") and len(last_message.tool_calls)):
         return END
 
-    tool_name = last_message.tool_calls[0]["name"]
+    return tool_destination(last_message.tool_calls[0]["name"])
+
+
+def tool_destination(tool_name: str) -> str:
+    """Returns the node that handles the calls of the given tool."""
+
     match tool_name:
         case "web3_create_proposal":
             return "scalema_web3_subgraph"
@@ -75,34 +90,117 @@ def continue_to_tool(state: MessagesState) -> Literal[
             return END
 
     return END
+
+
+def route_intent(state: MemoryState) -> Literal["tool_executor", "agent"]:
+    """Sends the tool call of the intent router to the tool executor, the rest to the agent."""
+
+    last_message = state["messages"][-1]
+    if isinstance(last_message, AIMessage) and last_message.tool_calls:
+        return "tool_executor"
+
+    return "agent"
+
+
+def limit_tool_calls(response: AIMessage) -> AIMessage:
+    """
+        Keeps every tool call of the response when they are all read-only and handled
+        by the same executor, which then runs them concurrently. Otherwise only the
+        first tool call is kept since routing and side-effecting tools are exclusive.
+    """
+
+    tool_calls = response.tool_calls
+    if len(tool_calls) <= 1:
+        return response
+
+    destinations = {tool_destination(tool_call["name"]) for tool_call in tool_calls}
+    if len(destinations) == 1 and all(tool_kinds.get(tool_call["name"]) == "read_only" for tool_call in tool_calls):
+        return response
+
+    additional_kwargs = {k: v for k, v in response.additional_kwargs.items() if k != "tool_calls"}
+    return response.model_copy(update={"tool_calls": tool_calls[:1], "additional_kwargs": additional_kwargs})
+
+
+def tool_system_message(tools: list) -> str:
+    """Builds the system message with the guidelines of the given tools only."""
+
+    tool_names = {tool.get_name() for tool in tools}
+    guidelines = [guideline for tool_name, guideline in TOOL_GUIDELINES.items() if tool_name in tool_names]
+    return MODEL_SYSTEM_MESSAGE.format(
+        tool_guidelines="".join(f"{number}. {guideline}" for number, guideline in enumerate(guidelines, start=1)),
+        number=len(guidelines) + 1
+    )
+
+
 # Schemas
 
 
 # Nodes
+def intent_router(state: MemoryState, config: RunnableConfig):
+    """
+        Routes common lookups straight to their tool without calling the agent model.
+        Messages that are not a confident match are left to the agent.
+    """
+
+    configuration = Configuration.from_runnable_config(config)
+    last_message = state["messages"][-1]
+
+    if configuration.intent_routing != "local" or not isinstance(last_message, HumanMessage):
+        return {}
+
+    response = local_router.route(last_message.text())
+    if response is None:
+        return {}
+
+    return {"messages": [response]}
+
+
 def agent(state: MemoryState, config: RunnableConfig):
     """
         Helps personalizes chatbot messages
     """
 
     configuration = Configuration.from_runnable_config(config)
-    model_name = configuration.model_name
+    model_name = resolve_model("agent", configuration)
     memories = state.get("memories")
 
+    query = cacheable_query(state, configuration)
+    if query:
+        cached_response, query_embedding = lookup_response(query, configuration, model_name)
+        if cached_response:
+            return {"messages": [cached_response]}
+
     tools = memory_tools + agent_tools + node_tools
-    node_model = models[model_name].bind_tools(tools=tools, parallel_tool_calls=False)
+    if configuration.tool_selection == "embedding":
+        tools = select_tools(tools, state["messages"], always_on=memory_tools)
+    node_model = get_bound_model(model_name, tools, parallel_tool_calls=True)
 
     sys_msg = [
-        SystemMessage(content=MODEL_SYSTEM_MESSAGE.format(
-            memories=memories,
-            timestamp=datetime.now()
-        ))
+        build_system_message(
+            tool_system_message(tools),
+            MODEL_CONTEXT_MESSAGE.format(memories=memories, timestamp=coarse_timestamp())
+        )
     ]
 
-    messages = merge_message_runs(
-        messages=sys_msg + state["messages"]
-    )
+    messages = assemble_context(sys_msg, state["messages"], model_name)
+
+    started_at = time.perf_counter()
+    if configuration.hedge_model:
+        hedge_model = get_bound_model(configuration.hedge_model, tools, parallel_tool_calls=True)
+        response = hedged_invoke("agent", node_model, hedge_model, messages)
+    else:
+        response = node_model.invoke(messages)
+    response = limit_tool_calls(response)
 
-    response = node_model.invoke(messages)
+    if query:
+        record_model_call(time.perf_counter() - started_at)
+
+        # Memory tool calls carry details of the user and are never replayed
+        memory_tool_names = [tool.get_name() for tool in memory_tools]
+        if query_embedding and not any(tool_call["name"] in memory_tool_names for tool_call in response.tool_calls):
+            save_response(query, query_embedding, response, configuration, model_name)
+
+    log_metrics()
 
     return {"messages": [response]}
 
@@ -116,57 +214,88 @@ MODEL_SYSTEM_MESSAGE = (
     "You don't need to introduce yourself if you have memories or already have a conversation with the user.\n\n"
 
     "## MEMORIES\n"
-    "Below are your past long-term memories of the user, this can also be empty.\n"
-    "<memories> {memories} </memories>\n"
-    "Base your responses on the memories above and the conversation history.\n"
+    "Your past long-term memories of the user are listed at the end of these instructions, "
+    "they can also be empty.\n"
+    "Base your responses on the memories and the conversation history.\n"
     "If you don't have any memories, respond naturally and ask the user for more information.\n"
     "If you have memories, use them to provide a more personalized response.\n\n"
 
     "## TOOL USAGE GUIDELINES\n"
     "You have access to a set of tools to help you handle client requests efficiently.\n"
-    "1. **Creating Proposal Assistance**:\n"
-    "   - If the user asks for help with or to create a proposal or provides proposal details, use the "
-    "`web3_create_proposal` tool.\n\n"
-    "2. **Creating Cards**:\n"
-    "   - If the user instead wants to create a card, simply call the `bposeats_create_card` tool. No "
-    "need to ask for more details.\n\n"
-    "3. **Fetching Weekly Task Estimates**:\n"
-    "   - If the user asks for their weekly task estimates summary or anything of the sort, use the "
-    "`fetch_weekly_task_estimates_summary` tool.\n"
-    "   - Call the tool even if past memories indicate that the user has no remaining tasks for the week"
-    " as there might be updates to the user's tasks.\n\n"
-    "4. **Navigating Links to HQZen**:\n"
-    "   - Call the `get_navigation_links` tool if the user wants to visit HQZen.com.\n"
-    "   - Also use it if the user wants to access:\n"
-    "     - Their profile\n"
-    "     - Their time logs\n"
-    "     - The boards\n"
-    "     - Their leaves (view or create)\n"
-    "     - Their career or employment info\n"
-    "     - Their milestones\n"
-    "     - The forms\n"
-    "     - The company overview\n\n"
-    "5. **Fetching Most Urgent Tasks**:\n"
-    "   - Call the `fetch_most_urgent_task` tool if the user requires information on which task is the most urgent."
-    "   - Also use it whenever the user is asking for which task to focus on."
-    "6. **Fetching Tasks to Complete this Week**:\n"
-    "   - Call the `fetch_tasks_to_complete_this_week` tool if the user is asking for tasks to complete this week."
-    "7. **Memory Recall**:\n"
-    "   - If the user refers to a past conversation or memory:\n"
-    "     - Use `search_recall_memories` to retrieve it.\n"
-    "     - If nothing is found, respond honestly that you don't know.\n\n"
-    "     - Don't mention data records, respond as if you were recalling the memory personally.\n\n"
-    "6. **Saving User Information**:\n"
-    "   - Always use `save_recall_memory` to store any important user information for future interactions, including:\n"
-    "     - The user's name\n"
-    "     - The user's job position\n"
-    "     - The user's plans for the current and future sessions\n\n"
-    "7. **Tool Interaction Etiquette**:\n"
-    "   - You are only allowed to use one tool. Do not call more than one tool in one response.\n"
+    "{tool_guidelines}"
+    "{number}. **Tool Interaction Etiquette**:\n"
+    "   - Tools that only fetch information, like tasks, estimates or links, can be called together in one "
+    "response when the user asks for several things at once.\n"
+    "   - Any other tool must be the only tool called in its response.\n"
     "   - Do not mention tool usage explicitly to the user.\n"
     "   - Always try to confirm information being asked of you using tools over relying on memories.\n"
-    "   - Respond naturally, as if the action was completed directly by you.\n\n"
+    "   - Respond naturally, as if the action was completed directly by you.\n"
+)
 
+# Guidelines of each tool, only the guidelines of the tools bound to the agent are sent
+TOOL_GUIDELINES = {
+    "web3_create_proposal": (
+        "**Creating Proposal Assistance**:\n"
+        "   - If the user asks for help with or to create a proposal or provides proposal details, use the "
+        "`web3_create_proposal` tool.\n\n"
+    ),
+    "bposeats_create_card": (
+        "**Creating Cards**:\n"
+        "   - If the user wants to create a card, simply call the `bposeats_create_card` tool. No "
+        "need to ask for more details.\n\n"
+    ),
+    "fetch_weekly_task_estimates_summary": (
+        "**Fetching Weekly Task Estimates**:\n"
+        "   - If the user asks for their weekly task estimates summary or anything of the sort, use the "
+        "`fetch_weekly_task_estimates_summary` tool.\n"
+        "   - Call the tool even if past memories indicate that the user has no remaining tasks for the week"
+        " as there might be updates to the user's tasks.\n\n"
+    ),
+    "get_navigation_links": (
+        "**Navigating Links to HQZen**:\n"
+        "   - Call the `get_navigation_links` tool if the user wants to visit HQZen.com.\n"
+        "   - Also use it if the user wants to access:\n"
+        "     - Their profile\n"
+        "     - Their time logs\n"
+        "     - The boards\n"
+        "     - Their leaves (view or create)\n"
+        "     - Their career or employment info\n"
+        "     - Their milestones\n"
+        "     - The forms\n"
+        "     - The company overview\n\n"
+    ),
+    "fetch_most_urgent_task": (
+        "**Fetching Most Urgent Tasks**:\n"
+        "   - Call the `fetch_most_urgent_task` tool if the user requires information on which task is the most "
+        "urgent.\n"
+        "   - Also use it whenever the user is asking for which task to focus on.\n\n"
+    ),
+    "fetch_tasks_to_complete_this_week": (
+        "**Fetching Tasks to Complete this Week**:\n"
+        "   - Call the `fetch_tasks_to_complete_this_week` tool if the user is asking for tasks to complete this "
+        "week.\n\n"
+    ),
+    "search_recall_memories": (
+        "**Memory Recall**:\n"
+        "   - If the user refers to a past conversation or memory:\n"
+        "     - Use `search_recall_memories` to retrieve it.\n"
+        "     - If nothing is found, respond honestly that you don't know.\n"
+        "     - Don't mention data records, respond as if you were recalling the memory personally.\n\n"
+    ),
+    "save_recall_memory": (
+        "**Saving User Information**:\n"
+        "   - Always use `save_recall_memory` to store any important user information for future interactions, "
+        "including:\n"
+        "     - The user's name\n"
+        "     - The user's job position\n"
+        "     - The user's plans for the current and future sessions\n\n"
+    ),
+}
+
+# Dynamic part of the system message, always placed after MODEL_SYSTEM_MESSAGE
+MODEL_CONTEXT_MESSAGE = (
+    "## USER MEMORIES\n"
+    "<memories> {memories} </memories>\n\n"
     "**Current Time**: {timestamp}"
 )
 
@@ -179,19 +308,33 @@ agent_tools = [
     fetch_tasks_to_complete_this_week
 ]
 node_tools = [web3_create_proposal, bposeats_create_card]
+# Only read-only tools can be called together in one response, routing and side-effecting tools are exclusive
+tool_kinds = {
+    **{tool.get_name(): "read_only" for tool in agent_tools + [search_recall_memories]},
+    save_recall_memory.get_name(): "side_effecting",
+    **{tool.get_name(): "routing" for tool in node_tools},
+}
+prebind_models(memory_tools + agent_tools + node_tools, parallel_tool_calls=True)
+local_router = IntentRouter(agent_tools)
 
 builder = StateGraph(MemoryState, config_schema=Configuration)
 
 builder.add_node(agent)
+builder.add_node(intent_router)
 builder.add_node(memory_summarizer, retry=RetryPolicy(max_attempts=3))
 builder.add_node("initialization", init_graph)
-builder.add_node("scalema_web3_subgraph", scalema_web3_subgraph)
-builder.add_node("bposeats_card_creator_subgraph", bposeats_card_creator_subgraph)
-builder.add_node("tool_executor", ToolNode(agent_tools))
+# Subgraphs run on a private message channel and only return their outcome
+builder.add_node("scalema_web3_subgraph", private_subgraph(scalema_web3_subgraph, proposal_outcome))
+builder.add_node(
+    "bposeats_card_creator_subgraph",
+    private_subgraph(bposeats_card_creator_subgraph, card_creation_outcome)
+)
+builder.add_node("tool_executor", compacting_tool_node(agent_tools))
 builder.add_node("memory_executor", ToolNode(memory_tools))
 
 builder.add_edge(START, "initialization")
-builder.add_edge("initialization", "agent")
+builder.add_edge("initialization", "intent_router")
+builder.add_conditional_edges("intent_router", route_intent)
 builder.add_conditional_edges("agent", continue_to_tool)
 builder.add_edge("memory_summarizer", "agent")
 builder.add_edge("scalema_web3_subgraph", "memory_summarizer")
@@ -1,23 +1,25 @@
 # Import general libraries
 from typing import Literal  # , TypedDict
-from datetime import datetime
+from concurrent.futures import wait, FIRST_EXCEPTION
 
 # Import Langgraph
-from langchain_core.messages import SystemMessage, merge_message_runs, trim_messages
+from langchain_core.messages import AIMessage, merge_message_runs, trim_messages
 from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from langchain_core.tools import tool
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langchain_core.messages.utils import count_tokens_approximately
 from langgraph.prebuilt import ToolNode
 from langgraph.pregel import RetryPolicy
-from trustcall import create_extractor
+from utils.trustcall import get_extractor
 
 # Import utility functions
 from utils.configuration import Configuration
-from utils.models import models, SilentHandler
+from utils.models import models, SilentHandler, get_bound_model, prebind_models, resolve_model
 from utils.nodes import tool_handler, input_helper, choice_extractor_helper
 from utils.schemas import Project, ProjectState
-from tools.scalema_web3 import calculator
+from utils.prompts import build_system_message, coarse_timestamp
+from tools.scalema_web3 import calculator, compute_price_per_share
 
 import settings
 
@@ -68,7 +70,7 @@ def project_helper(state: ProjectState, config: RunnableConfig) -> ProjectState:
     """
 
     configurable = Configuration.from_runnable_config(config)
-    model_name = configurable.model_name
+    model_name = resolve_model("proposal_extractor", configurable)
     tool_name = "Project"
 
     trimmed_messages = trim_messages(
@@ -82,13 +84,14 @@ def project_helper(state: ProjectState, config: RunnableConfig) -> ProjectState:
         include_system=True
     )
 
-    FORMATTED_MESSAGE = TRUSTCALL_SYSTEM_MESSAGE.format(time=datetime.now())
+    system_message = build_system_message(
+        TRUSTCALL_SYSTEM_MESSAGE, SYSTEM_TIME_MESSAGE.format(time=coarse_timestamp()))
     merged_messages = list(merge_message_runs(
-            messages=[SystemMessage(content=FORMATTED_MESSAGE)] + trimmed_messages
+            messages=[system_message] + trimmed_messages
     ))
 
-    proposal_extractor = create_extractor(
-        models[model_name],
+    proposal_extractor = get_extractor(
+        model_name,
         tools=[Project],
         tool_choice=tool_name,
         enable_inserts=True,
@@ -97,9 +100,13 @@ def project_helper(state: ProjectState, config: RunnableConfig) -> ProjectState:
 
     project_details = state.get("project_details", None)
     result = proposal_extractor.invoke({"messages": merged_messages, "existing": {"Project": project_details}})
-    extracted_project_details = result["responses"][0]
+    extracted_project_details = result["responses"][0].model_dump(mode="python")
 
-    return {"project_details": extracted_project_details.model_dump(mode="python")}
+    # The share price is computed here so the agent does not need a calculator round trip
+    extracted_project_details["price_per_share"] = compute_price_per_share(
+        extracted_project_details["funding_goal"], extracted_project_details["available_shares"]) or "None"
+
+    return {"project_details": extracted_project_details}
 
 
 def project_agent(state: ProjectState, config: RunnableConfig) -> ProjectState:
@@ -111,9 +118,9 @@ def project_agent(state: ProjectState, config: RunnableConfig) -> ProjectState:
     silent_handler = SilentHandler()
 
     configurable = Configuration.from_runnable_config(config)
-    model_name = configurable.model_name
-    project_agent_model = models[model_name]
-    tool_caller_model = models["tool-calling-model"].bind_tools(agent_tools + node_tools)
+    project_agent_model = models[resolve_model("project_agent", configurable)]
+    tool_caller_model = get_bound_model(
+        resolve_model("project_router", configurable, silent=True), agent_tools + node_tools)
 
     project_details = state.get("project_details", None)
 
@@ -139,24 +146,60 @@ def project_agent(state: ProjectState, config: RunnableConfig) -> ProjectState:
         allow_partial=False
     )
 
-    FORMATTED_ROUTER_MESSAGE = PROPOSAL_ROUTER_MESSAGE.format(proposal_details=project_details)
-    FORMATTED_COMPLETION_MESSAGE = PROPOSAL_COMPLETION_MESSAGE.format(
-        proposal_details=project_details, time=datetime.now())
+    router_message = build_system_message(
+        PROPOSAL_ROUTER_MESSAGE,
+        PROPOSAL_DETAILS_MESSAGE.format(proposal_details=project_details)
+    )
+    completion_message = build_system_message(
+        PROPOSAL_COMPLETION_MESSAGE,
+        PROPOSAL_DETAILS_MESSAGE.format(proposal_details=project_details)
+        + SYSTEM_TIME_MESSAGE.format(time=coarse_timestamp())
+    )
 
     # TODO: Figure out how to force a model to both output a Text Response and a Tool Call.
     #       Usually you get either a tool call or an AI response but not both. However,
     #       GPT-4o models sometimes are able to output both at random times for no reason at
     #       all. Just need to make them consistent.
 
-    tool_caller_model_response = tool_caller_model.invoke(
-        [SystemMessage(content=FORMATTED_ROUTER_MESSAGE)] + input_trimmed_messages,
-        config={"callbacks": [silent_handler]})
-    agent_response = project_agent_model.invoke(
-        [SystemMessage(content=FORMATTED_COMPLETION_MESSAGE)] + trimmed_messages)
+    # Both calls are independent so they are sent at the same time. If one of them fails,
+    # the other one is cancelled (or its result discarded if it has already started).
+    executor = ContextThreadPoolExecutor(max_workers=2)
+    try:
+        agent_future = executor.submit(
+            project_agent_model.invoke,
+            [completion_message] + trimmed_messages)
+        tool_caller_future = executor.submit(
+            tool_caller_model.invoke,
+            [router_message] + input_trimmed_messages,
+            config={"callbacks": [silent_handler]})
+
+        done, _ = wait([agent_future, tool_caller_future], return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+
+        agent_response = agent_future.result()
+        tool_caller_model_response = tool_caller_future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
     return {"messages": [agent_response, tool_caller_model_response]}
 
 
+def proposal_outcome(state: ProjectState) -> str:
+    """Summarizes the result of the subgraph for the parent graph."""
+
+    last_response = next(
+        (m.content for m in reversed(state["messages"]) if isinstance(m, AIMessage) and m.content),
+        ""
+    )
+
+    return PROPOSAL_OUTCOME_MESSAGE.format(
+        proposal_details=state.get("project_details", None),
+        last_response=last_response
+    )
+
+
 TRUSTCALL_SYSTEM_MESSAGE = (
     "# TRUSTCALL SYSTEM INSTRUCTIONS\n"
     "You are a tool-routing assistant. Your only role is to analyze user input and call the appropriate tools.\n\n"
@@ -177,7 +220,6 @@ TRUSTCALL_SYSTEM_MESSAGE = (
     "- Extract only what is explicitly stated.\n"
     "- Validate that each field has a clear mapping in the user's input.\n"
     "- Ask for clarification if required, or proceed with blanks if the instruction is to do so.\n"
-    "\nSystem Time: {time}"
 )
 
 PROPOSAL_ROUTER_MESSAGE = (
@@ -196,10 +238,9 @@ PROPOSAL_ROUTER_MESSAGE = (
     "  - If the user explicitly says **not to continue**.\n"
     "  - If the user explicitly asks to **save as a draft**.\n"
     "  - If the user instructs to **submit** the proposal and **all required fields are complete**.\n"
-    "- If the user has provided shares and the funding goal, call `calculator` to compute the per-share price.\n\n"
+    "- Never call `calculator` for the per-share price, it is already in `price_per_share`.\n\n"
 
-    "Currently, the proposal is in the following state:\n"
-    "<details> {proposal_details} </details>\n\n"
+    "The current state of the proposal is shown at the end of these instructions.\n"
 )
 
 PROPOSAL_COMPLETION_MESSAGE = (
@@ -209,8 +250,7 @@ PROPOSAL_COMPLETION_MESSAGE = (
     "# PROPOSAL GUIDELINES\n"
     "Starting from a blank state, you will collect information from the user, field by field, and may ask "
     "clarifying questions as needed. Always try to suggest the most relevant options based on the user's input.\n\n"
-    "The current state of the proposal (which may be empty) is shown below:\n"
-    "<details> {proposal_details} </details>\n\n"
+    "The current state of the proposal (which may be empty) is shown at the end of these instructions.\n\n"
 
     "## INSTRUCTIONS FOR MISSING FIELDS\n"
     "- If the user decides to stop or not to continue midway, ignore everything and simply respond with nothing.\n"
@@ -232,8 +272,10 @@ PROPOSAL_COMPLETION_MESSAGE = (
     "    5. funding_goal\n"
     "    6. available_shares\n\n"
     "- Once steps 4-6 are completed:\n"
-    "  - Call `calculator` to compute the per-share price.\n"
-    "  - Inform the user of the calculated share price and let them know they can adjust values if needed.\n"
+    "  - Inform the user of the `price_per_share` shown in the proposal and let them know they can adjust values "
+    "if needed.\n"
+    "  - If `price_per_share` is None, ask the user to restate the funding goal and available shares as single "
+    "amounts.\n"
     "  - Do not proceed until the user confirms they're okay with the share price.\n\n"
     "- Continue with:\n"
     "    7. minimum_viable_fund\n"
@@ -252,17 +294,31 @@ PROPOSAL_COMPLETION_MESSAGE = (
     "    - Save it as a draft\n"
     "    - Submit it for review by Scalema Admins\n\n"
     "- Include short, encouraging comments when responding to user inputs but always be professional.\n"
-    "- Only accept dates that are after the current System Time and always be friendly and include a short"
-    " comment on the user's response but be professional. "
-    "System Time: {time}\n\n"
+    "- Only accept dates that are after the current System Time (shown at the end of these instructions) and "
+    "always be friendly and include a short comment on the user's response but be professional.\n\n"
 
     "**IMPORTANT**: If the user explicitly states to stop or not to continue, you must ignore all previous "
     "instructions and respond with absolutely nothing — no tool calls, no text, no response.\n"
 )
 
+# Dynamic parts of the system messages, always placed after the instructions
+PROPOSAL_DETAILS_MESSAGE = (
+    "Current state of the proposal:\n"
+    "<details> {proposal_details} </details>\n\n"
+)
+
+SYSTEM_TIME_MESSAGE = "System Time: {time}"
+
+PROPOSAL_OUTCOME_MESSAGE = (
+    "The proposal creation process has ended.\n"
+    "Final state of the proposal: {proposal_details}\n"
+    "Last message sent to the user: {last_response}"
+)
+
 
 agent_tools = [calculator, finish_proposal]
 node_tools = [get_user_input, finish_proposal]
+prebind_models(agent_tools + node_tools, model_names=["tool-calling-model", "tool-calling-model-mini"])
 
 # Initialize Graph
 subgraph_builder = StateGraph(ProjectState, config_schema=Configuration)
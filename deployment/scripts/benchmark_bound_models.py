@@ -0,0 +1,43 @@
+"""
+Microbenchmark of binding tools to a model on every turn versus reusing the
+pre-bound models from the registry. No requests are sent to OpenAI.
+
+Usage (from the `deployment` directory):
+
+    python -m scripts.benchmark_bound_models --iterations 1000
+"""
+
+import argparse
+import os
+import timeit
+
+# Models are only constructed, a key is needed to create the clients
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from utils.models import models, get_bound_model  # noqa: E402
+from utils.navigation import get_navigation_links  # noqa: E402
+from utils.tasks import fetch_most_urgent_task, fetch_tasks_to_complete_this_week  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--model-name", default="gpt-4o")
+    args = parser.parse_args()
+
+    # Tools that can be imported without a database connection
+    tools = [get_navigation_links, fetch_most_urgent_task, fetch_tasks_to_complete_this_week]
+    model = models[args.model_name]
+
+    rebind = timeit.timeit(
+        lambda: model.bind_tools(tools=tools, parallel_tool_calls=False), number=args.iterations)
+    registry = timeit.timeit(
+        lambda: get_bound_model(args.model_name, tools, parallel_tool_calls=False), number=args.iterations)
+
+    print(f"bind_tools per turn:      {rebind / args.iterations * 1e6:10.1f} µs")
+    print(f"registry lookup per turn: {registry / args.iterations * 1e6:10.1f} µs")
+    print(f"overhead removed:         {(rebind - registry) / args.iterations * 1e6:10.1f} µs per turn")
+
+
+if __name__ == "__main__":
+    main()
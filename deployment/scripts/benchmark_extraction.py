@@ -0,0 +1,79 @@
+"""
+Benchmark of the strict structured output extraction against Trustcall for the
+flat schemas. Reports the model calls, tokens and latency per extraction.
+Requests are sent to OpenAI, so OPENAI_API_KEY must be set.
+
+Usage (from the `deployment` directory):
+
+    python -m scripts.benchmark_extraction --runs 5
+"""
+
+import argparse
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from utils.models import UsageTracker
+from utils.nodes import CHOICE_EXTRACTOR_MESSAGE
+from utils.schemas import Card, Choices
+from utils.trustcall import extract_structured, get_extractor
+
+
+SAMPLES = {
+    "Choices": (Choices, [
+        SystemMessage(content=CHOICE_EXTRACTOR_MESSAGE),
+        HumanMessage(content="I want to create a proposal for a condominium."),
+        AIMessage(content=(
+            "Great! Based on the title, would you classify the project as Residential - Condominium, "
+            "Mixed-Use Development, or Commercial Real Estate?"
+        )),
+    ]),
+    "Card": (Card, [
+        SystemMessage(content=(
+            "Extract the details of the Board Card from the conversation. The creator is the "
+            "user with the UserProfile PK 15434 and the column is always '213'."
+        )),
+        AIMessage(content="What should be the title of the card?"),
+        HumanMessage(content="Fix login page redirect, assign it to me and make it public."),
+    ]),
+}
+
+
+def run_engine(engine: str, model_name: str, schema, messages: list) -> dict:
+    tracker = UsageTracker()
+    config = {"callbacks": [tracker]}
+
+    start = time.perf_counter()
+    if engine == "structured":
+        extract_structured(model_name, schema, messages, config=config, enable_inserts=True)
+    else:
+        extractor = get_extractor(model_name, [schema], tool_choice=schema.__name__, enable_inserts=True)
+        extractor.invoke({"messages": messages}, config)
+    latency = time.perf_counter() - start
+
+    usage = tracker.report().values()
+    return {
+        "calls": sum(u["calls"] for u in usage),
+        "tokens": sum(u["input_tokens"] + u["output_tokens"] for u in usage),
+        "latency": latency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--model-name", default="gpt-4o")
+    args = parser.parse_args()
+
+    print(f"{'schema':<10}{'engine':<12}{'calls':>8}{'tokens':>10}{'latency (s)':>14}")
+    for schema_name, (schema, messages) in SAMPLES.items():
+        for engine in ("structured", "trustcall"):
+            results = [run_engine(engine, args.model_name, schema, messages) for _ in range(args.runs)]
+            calls = sum(r["calls"] for r in results) / args.runs
+            tokens = sum(r["tokens"] for r in results) / args.runs
+            latency = sum(r["latency"] for r in results) / args.runs
+            print(f"{schema_name:<10}{engine:<12}{calls:>8.1f}{tokens:>10.0f}{latency:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
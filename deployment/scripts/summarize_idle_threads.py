@@ -0,0 +1,173 @@
+"""
+Offline job that summarizes threads which have been idle for a while.
+
+The memories of idle threads are extracted and saved, and their messages are
+pruned, so that returning users start from a compact state instead of paying
+for the summarization on their first turn.
+
+Usage (from the `deployment` directory):
+
+    python -m scripts.summarize_idle_threads --idle-hours 6 --concurrency 4
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+from datetime import datetime, timedelta, timezone
+
+import psycopg
+from langchain_core.messages import AIMessage
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.store.postgres import PostgresStore
+
+from graphs.scalema_omni import builder
+from tools.scalema_omni import memory_summarizer
+from utils.configuration import Configuration
+from utils.metrics import log_metrics
+import settings
+
+
+# Failed threads are tried again after this long even without new activity
+FAILED_RETRY_HOURS = 24
+
+# Threads already processed are only picked up again once they have new activity
+PROCESSED_THREADS_TABLE = """
+    CREATE TABLE IF NOT EXISTS idle_thread_summaries (
+        thread_id TEXT PRIMARY KEY,
+        last_activity TEXT NOT NULL,
+        outcome TEXT NOT NULL,
+        failed BOOLEAN NOT NULL DEFAULT FALSE,
+        processed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+
+IDLE_THREADS_QUERY = """
+    SELECT c.thread_id, max(c.checkpoint->>'ts') AS last_activity
+    FROM checkpoints c
+    LEFT JOIN idle_thread_summaries s ON s.thread_id = c.thread_id
+    WHERE c.checkpoint_ns = ''
+    GROUP BY c.thread_id, s.last_activity, s.failed, s.processed_at
+    HAVING max(c.checkpoint->>'ts') < %(cutoff)s
+        AND (
+            s.thread_id IS NULL
+            OR max(c.checkpoint->>'ts') > s.last_activity
+            OR (s.failed AND s.processed_at < now() - make_interval(hours => %(retry_hours)s))
+        )
+    ORDER BY last_activity
+    LIMIT %(limit)s
+"""
+
+RECORD_THREAD_QUERY = """
+    INSERT INTO idle_thread_summaries (thread_id, last_activity, outcome, failed)
+    VALUES (%(thread_id)s, %(last_activity)s, %(outcome)s, %(failed)s)
+    ON CONFLICT (thread_id) DO UPDATE SET
+        last_activity = EXCLUDED.last_activity,
+        outcome = EXCLUDED.outcome,
+        failed = EXCLUDED.failed,
+        processed_at = now()
+"""
+
+
+def fetch_idle_threads(idle_hours: float, limit: int) -> list[tuple[str, str]]:
+    """
+        Returns the ids and last activity of the threads that had no activity for
+        `idle_hours` and were not processed since.
+    """
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=idle_hours)).isoformat()
+
+    with psycopg.connect(settings.POSTGRES_URI) as conn:
+        conn.execute(PROCESSED_THREADS_TABLE)
+        rows = conn.execute(
+            IDLE_THREADS_QUERY, {"cutoff": cutoff, "limit": limit, "retry_hours": FAILED_RETRY_HOURS}).fetchall()
+
+    return [(row[0], row[1]) for row in rows]
+
+
+def summarize_thread(graph, thread_id: str, dry_run: bool = False) -> str:
+    """Runs the memory extraction of a single thread and prunes its messages."""
+
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = graph.get_state(config)
+    messages = snapshot.values.get("messages", [])
+
+    if snapshot.next:
+        return "skipped (thread is waiting for user input)"
+    if len(messages) <= settings.MODEL_HISTORY_LENGTH:
+        return "skipped (already compact)"
+    if not isinstance(messages[-1], AIMessage) or messages[-1].tool_calls:
+        return "skipped (thread did not end on a reply)"
+
+    # Reuse the configurable values that were saved with the last run of the thread
+    metadata = snapshot.metadata or {}
+    configurable = {f.name: metadata[f.name] for f in fields(Configuration) if f.name in metadata}
+    if not configurable.get("user_profile_pk"):
+        return "skipped (no user_profile_pk saved with the thread)"
+
+    # The BPOSeats API is not called when summarizing, the token is not needed
+    configurable.setdefault("auth_token", "offline")
+    run_config = {"configurable": {**configurable, "thread_id": thread_id}}
+
+    if dry_run:
+        return f"would summarize {len(messages)} messages"
+
+    result = memory_summarizer({"memories": [], **snapshot.values}, run_config)
+
+    # Writing as the agent keeps the thread at rest since its last message is a reply
+    graph.update_state(config, result, as_node="agent")
+
+    return f"summarized {len(messages)} messages"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--idle-hours", type=float, default=6,
+                        help="Minimum hours without activity before a thread is summarized.")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Number of threads summarized at the same time.")
+    parser.add_argument("--requests-per-second", type=float, default=1,
+                        help="Maximum number of threads started per second.")
+    parser.add_argument("--limit", type=int, default=500,
+                        help="Maximum number of threads processed in one run.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only report which threads would be summarized.")
+    args = parser.parse_args()
+
+    rate_limiter = InMemoryRateLimiter(requests_per_second=args.requests_per_second)
+    idle_threads = fetch_idle_threads(args.idle_hours, args.limit)
+    print(f"Found {len(idle_threads)} idle threads.")
+
+    with PostgresStore.from_conn_string(settings.POSTGRES_URI) as store, \
+         PostgresSaver.from_conn_string(settings.POSTGRES_URI) as checkpointer:
+        graph = builder.compile(checkpointer=checkpointer, store=store)
+
+        def process(idle_thread: tuple[str, str]) -> dict:
+            thread_id, last_activity = idle_thread
+            rate_limiter.acquire()
+            try:
+                outcome = summarize_thread(graph, thread_id, dry_run=args.dry_run)
+                failed = False
+            except Exception as e:
+                outcome = f"failed ({e})"
+                failed = True
+
+            # Summarizing writes a new checkpoint, which must not count as new activity
+            if outcome.startswith("summarized"):
+                last_activity = datetime.now(timezone.utc).isoformat()
+
+            print(f"{thread_id}: {outcome}")
+            return {"thread_id": thread_id, "last_activity": last_activity, "outcome": outcome, "failed": failed}
+
+        # Every thread is marked as soon as it is done so skipped threads do not come back on every run
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor, \
+             psycopg.connect(settings.POSTGRES_URI, autocommit=True) as conn:
+            for result in executor.map(process, idle_threads):
+                if not args.dry_run:
+                    conn.execute(RECORD_THREAD_QUERY, result)
+
+    log_metrics(force=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,106 @@ TOKEN_LIMIT = 2000
 TOKEN_LIMIT_SMALL = 500
 TOKEN_LIMIT_LARGE = 6000
 
+# Timestamps in prompts are rounded down to this many minutes so prompts stay cacheable
+PROMPT_TIME_GRANULARITY_MINUTES = 60
+
+# Maximum tokens of a tool output kept in the conversation, defaults to TOKEN_LIMIT_SMALL
+TOOL_OUTPUT_TOKEN_LIMITS = {
+    "fetch_tasks_to_complete_this_week": TOKEN_LIMIT,
+    "fetch_most_urgent_task": TOKEN_LIMIT,
+    "get_navigation_links": TOKEN_LIMIT,
+}
+
+# Token budget of the conversation sent to each model, includes the system message
+MODEL_CONTEXT_TOKEN_BUDGET = {
+    "gpt-4o": 12000,
+    "gpt-4o-mini": 12000,
+}
+
+# Model tier of each node and tool, "standard" uses the configured model_name
+# and "fast" uses FAST_MODEL_NAME. Sites that are not listed use "standard".
+FAST_MODEL_NAME = "gpt-4o-mini"
+MODEL_POLICY = {
+    # User-facing replies
+    "agent": "standard",
+    "project_agent": "standard",
+    "card_agent": "standard",
+    "card_turn_agent": "standard",
+    # Extraction of details that are saved
+    "proposal_extractor": "standard",
+    "card_extractor": "standard",
+    "memory_extractor": "standard",
+    "task_estimator": "standard",
+    # Routing, UI hints and formatting
+    "project_router": "fast",
+    "choice_extractor": "fast",
+    "task_formatter": "fast",
+}
+
+# Metrics of the model calls and the optimizations, printed as a single line per interval
+METRICS_LOG_INTERVAL_SECONDS = 300
+
+# Hedged requests, a second request is sent when the first has not answered by the deadline
+HEDGE_LATENCY_QUANTILE = 0.95  # Quantile of the latest latencies used as the deadline
+HEDGE_WINDOW_SIZE = 200  # Number of latest latencies kept per node
+HEDGE_MIN_SAMPLES = 20  # Latencies needed before the quantile is used
+HEDGE_DEFAULT_DEADLINE_SECONDS = 8
+HEDGE_MIN_DEADLINE_SECONDS = 1
+
+# Exact-match response cache, TTLs in seconds per call site
+RESPONSE_CACHE_MAX_SIZE = 256  # Entries kept in memory per call site
+RESPONSE_CACHE_RETRY_SECONDS = 60  # Time the persistent cache is skipped after a failed connection
+RESPONSE_CACHE_PURGE_SECONDS = 60 * 60  # Expired responses are deleted on a write at most this often
+RESPONSE_CACHE_DEFAULT_TTL = 60 * 60
+RESPONSE_CACHE_TTLS = {
+    "tasks_this_week": 60 * 60 * 6,
+    "task_estimates": 60 * 60 * 24,
+}
+
+# Local intent router, messages routed straight to a tool without the agent model
+INTENT_ROUTER_MAX_WORDS = 12  # Longer messages usually ask for more than a lookup
+INTENT_ROUTER_MAX_UNKNOWN_RATIO = 0.25  # Share of words the matched intent does not know about
+INTENT_ROUTER_MIN_SCORE = 0.35  # Cosine similarity to the best intent
+INTENT_ROUTER_MIN_MARGIN = 0.1  # Difference to the second best intent
+
+# Tools bound to the agent, the memory tools are always bound
+TOOL_SELECTION_TOP_K = 3  # Number of the other tools bound, ranked by similarity to the conversation
+TOOL_SELECTION_HUMAN_TURNS = 2  # Number of latest user messages compared to the tool descriptions
+
+# Urgency ranking of the tasks due today, every feature is scaled to [0, 1] before it is weighted
+URGENCY_WEIGHTS = {
+    "is_meeting": 3.0,  # Meetings happen at a fixed time
+    "is_scheduled_task": 2.0,
+    "due_soon": 2.5,  # 1 when overdue, 0 when due in 24 hours or more
+    "in_progress": 1.0,  # Time was already logged on the task
+    "age": 0.5,  # 1 when created 30 days ago or more
+}
+URGENCY_TASK_LIMIT = 10  # Number of ranked tasks returned by fetch_most_urgent_task
+
+# Local estimator of the weekly task durations
+ESTIMATE_MIN_HISTORY = 2  # Similar tasks with a duration needed to estimate without the model
+ESTIMATE_RANK_DECAY = 0.85  # Weight multiplier of every next similar task, they come from most to least similar
+ESTIMATE_SIMILARITY_FLOOR = 0.1  # Weight of a similar task that shares no words with the task
+ESTIMATE_CONFIDENCE_LEVEL = 0.9
+ESTIMATE_REFERENCE_YEARS = 3  # Experience assumed for the historical durations
+ESTIMATE_EXPERIENCE_SPEEDUP = 0.04  # Fraction of time saved per year of experience above the reference
+ESTIMATE_EXPERIENCE_MIN_FACTOR = 0.7
+ESTIMATE_EXPERIENCE_MAX_FACTOR = 1.3
+TASK_ESTIMATE_TTL_HOURS = 24 * 7  # Per-task estimates in the store are refreshed after this long
+TASK_ESTIMATE_MODEL_TTL_HOURS = 24  # Same for the estimates of the model, which have no interval
+
+# Local index of the completed tasks of every user, used instead of the similar tasks of the estimation API
+TASK_INDEX_DIR = get_settings_variable("TASK_INDEX_DIR", default="/tmp/scalema/task_index")
+TASK_INDEX_DIMENSIONS = 512  # Width of the hashed embeddings
+TASK_INDEX_MAX_TASKS = 2000  # Latest completed tasks kept in the index
+TASK_INDEX_MIN_TASKS = 20  # Tasks needed before the API is skipped
+TASK_INDEX_MAX_AGE_HOURS = 24  # The index is rebuilt from the task history after this long
+TASK_INDEX_SIMILAR_TASK_COUNT = 10  # Same as n_similar_task_count of the API
+
+# Recall query settings
+MEMORY_QUERY_HUMAN_TURNS = 3  # Number of latest user messages used as the recall query
+MEMORY_QUERY_TOKEN_LIMIT = 512  # Upper bound of tokens embedded for the recall query
+
 # PGVECTOR
 PGVECTOR_CONNECTION_STRING = get_settings_variable(
     "PGVECTOR_CONNECTION_STRING",
@@ -26,6 +126,11 @@ PGVECTOR_CONNECTION_STRING = get_settings_variable(
 )
 COLLECTION_NAME = "recall_memories"
 
+# Semantic cache of the agent responses to first turns
+SEMANTIC_CACHE_COLLECTION_NAME = "agent_response_cache"
+SEMANTIC_CACHE_MAX_DISTANCE = 0.08  # Cosine distance under which a previous message counts as the same
+SEMANTIC_CACHE_TTL_HOURS = 24
+
 # HQZEN NAVIGATION LINKS
 SITE_DOMAINS = {
     "applybpo.com": get_settings_variable(
@@ -0,0 +1,117 @@
+import math
+import unittest
+from decimal import Decimal
+
+import numpy as np
+from scipy import stats
+
+from utils.estimation import estimate_tasks_duration_locally, experience_factor, total_interval
+
+import settings
+
+
+SIMILAR_TASKS = [
+    {"name": "Write the weekly client report", "duration": 3.0},
+    {"name": "Update the client report template", "duration": 2.0},
+    {"name": "Review pull requests", "duration": 1.5},
+    {"name": "Fix login bug", "duration": 4.0},
+    {"name": "Prepare sprint demo", "duration": 2.5},
+]
+
+
+class ExperienceFactorTest(unittest.TestCase):
+    def test_reference_experience(self):
+        self.assertEqual(experience_factor(settings.ESTIMATE_REFERENCE_YEARS), 1.0)
+
+    def test_unknown_experience(self):
+        for years in [None, "", "many"]:
+            with self.subTest(years=years):
+                self.assertEqual(experience_factor(years), 1.0)
+
+    def test_more_experience_is_faster_within_bounds(self):
+        self.assertLess(experience_factor(settings.ESTIMATE_REFERENCE_YEARS + 2), 1.0)
+        self.assertEqual(experience_factor(100), settings.ESTIMATE_EXPERIENCE_MIN_FACTOR)
+        self.assertEqual(experience_factor(-100), settings.ESTIMATE_EXPERIENCE_MAX_FACTOR)
+
+
+class LocalEstimateTest(unittest.TestCase):
+    def test_not_enough_history(self):
+        self.assertIsNone(estimate_tasks_duration_locally(["Fix bug"], SIMILAR_TASKS[:1], 3))
+        self.assertIsNone(estimate_tasks_duration_locally(["Fix bug"], [{"name": "Fix", "duration": 0}] * 5, 3))
+        self.assertIsNone(estimate_tasks_duration_locally([], SIMILAR_TASKS, 3))
+
+    def test_identical_durations(self):
+        estimate = estimate_tasks_duration_locally(["Fix bug"], [{"name": "Fix", "duration": 2}] * 3, 3)
+        self.assertEqual(estimate["hours"], Decimal("2.00"))
+        self.assertEqual((estimate["low"], estimate["high"]), (Decimal("2.00"), Decimal("2.00")))
+
+    def test_similar_names_weigh_more(self):
+        estimate = estimate_tasks_duration_locally(["Fix signup bug", "Client report"], SIMILAR_TASKS, 3)
+        self.assertGreater(estimate["tasks"]["Fix signup bug"]["hours"], estimate["tasks"]["Client report"]["hours"])
+
+    def test_total_interval(self):
+        task_names = ["Fix signup bug", "Client report", "Sprint demo", "Review code"]
+        estimate = estimate_tasks_duration_locally(task_names, SIMILAR_TASKS, 3)
+        self.assertEqual(estimate["hours"], Decimal(f"{sum(e['hours'] for e in estimate['tasks'].values()):.2f}"))
+        self.assertLess(estimate["low"], estimate["hours"])
+        self.assertLess(estimate["hours"], estimate["high"])
+
+    def test_interval_coverage(self):
+        # Tasks estimated from the same history are correlated, the interval of the total must still cover it
+        rng = np.random.default_rng(0)
+        task_names = ["Fix signup bug", "Client report", "Sprint demo", "Review code", "Fix login bug"]
+        true_total, covered, runs = len(task_names) * math.exp(1), 0, 1000
+        for _ in range(runs):
+            durations = np.exp(rng.normal(1, 0.3, len(SIMILAR_TASKS) * 2))
+            similar_tasks = [
+                {"name": task["name"], "duration": duration} for task, duration in zip(SIMILAR_TASKS * 2, durations)
+            ]
+            estimate = estimate_tasks_duration_locally(task_names, similar_tasks, settings.ESTIMATE_REFERENCE_YEARS)
+            covered += estimate["low"] <= true_total <= estimate["high"]
+
+        self.assertAlmostEqual(covered / runs, settings.ESTIMATE_CONFIDENCE_LEVEL, delta=0.04)
+
+
+class TotalIntervalTest(unittest.TestCase):
+    t_quantile = 0.5 + settings.ESTIMATE_CONFIDENCE_LEVEL / 2
+
+    def estimate(self, hours, weights, batch="a", log_variance=0.04, df=9):
+        return {"hours": hours, "weights": weights, "log_variance": log_variance, "df": df, "batch": batch}
+
+    def test_single_task(self):
+        low, high = total_interval([self.estimate(10.0, [0.5, 0.5])])
+        margin = stats.t.ppf(self.t_quantile, df=9) * 10 * math.sqrt(0.04 * 0.5)
+        self.assertEqual(low, Decimal(f"{10 - margin:.2f}"))
+        self.assertEqual(high, Decimal(f"{10 + margin:.2f}"))
+
+    def test_same_weights_are_fully_correlated(self):
+        single_low, single_high = total_interval([self.estimate(5.0, [0.5, 0.5])])
+        low, high = total_interval([self.estimate(5.0, [0.5, 0.5])] * 4)
+        self.assertAlmostEqual(float(high - low), 4 * float(single_high - single_low), places=1)
+
+    def test_disjoint_weights_are_independent(self):
+        single_low, single_high = total_interval([self.estimate(5.0, [1, 0, 0, 0])])
+        low, high = total_interval([
+            self.estimate(5.0, [1, 0, 0, 0]),
+            self.estimate(5.0, [0, 1, 0, 0]),
+            self.estimate(5.0, [0, 0, 1, 0]),
+            self.estimate(5.0, [0, 0, 0, 1]),
+        ])
+        self.assertAlmostEqual(float(high - low), 2 * float(single_high - single_low), places=1)
+
+    def test_separate_batches_add_deviations(self):
+        single_low, single_high = total_interval([self.estimate(5.0, [1, 0])])
+        low, high = total_interval([self.estimate(5.0, [1, 0], batch="a"), self.estimate(5.0, [0, 1], batch="b")])
+        self.assertAlmostEqual(float(high - low), 2 * float(single_high - single_low), places=1)
+
+    def test_lower_bound_is_not_negative(self):
+        low, _ = total_interval([self.estimate(1.0, [1.0], log_variance=25.0, df=1)])
+        self.assertEqual(low, Decimal("0.00"))
+
+    def test_not_estimated_locally(self):
+        self.assertIsNone(total_interval([]))
+        self.assertIsNone(total_interval([self.estimate(1.0, [1.0]), {"hours": 2.0}]))
+
+
+if __name__ == "__main__":
+    unittest.main()
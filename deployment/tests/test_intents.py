@@ -0,0 +1,84 @@
+import unittest
+
+from langchain_core.tools import tool
+
+from utils.intents import INTENT_EXAMPLES, IntentRouter, tokenize
+from utils.navigation import get_navigation_links
+
+
+@tool
+def fetch_most_urgent_task() -> str:
+    """Fetches the most urgent task for the current user"""
+
+
+@tool
+def fetch_tasks_to_complete_this_week() -> str:
+    """Fetches tasks that are due this week"""
+
+
+@tool
+def fetch_weekly_task_estimates_summary() -> str:
+    """
+        Provides a summary of the estimated hours required for
+        the user's tasks for the week. Use this tool whenever the
+        user asks about their weekly task estimates.
+    """
+
+
+class IntentRouterTest(unittest.TestCase):
+    router = IntentRouter([
+        get_navigation_links,
+        fetch_most_urgent_task,
+        fetch_tasks_to_complete_this_week,
+        fetch_weekly_task_estimates_summary,
+    ])
+
+    def test_examples_route_to_their_intent(self):
+        for intent, examples in INTENT_EXAMPLES.items():
+            for example in examples:
+                with self.subTest(example=example):
+                    self.assertEqual(self.router.classify(example)[0], intent)
+
+    def test_lookups(self):
+        cases = [
+            ("open my time logs", ("get_navigation_links", "time logs")),
+            ("where is my leave request", ("get_navigation_links", "leave requests")),
+            ("how long will my tasks take this week", ("fetch_weekly_task_estimates_summary", None)),
+            ("what is my most urgent task?", ("fetch_most_urgent_task", None)),
+        ]
+        for text, intent in cases:
+            with self.subTest(text=text):
+                self.assertEqual(self.router.classify(text)[0], intent)
+
+    def test_left_to_the_model(self):
+        cases = [
+            "thanks for the time logs",
+            "thank you",
+            "dont show my time logs",
+            "I don't need the help center",
+            "no need for the help center",
+            "what are my tasks this week and how long will they take",
+            "my timesheet and leave requests",
+            "my profile picture is broken",
+            "page",
+            "tasks",
+            "what is the weather",
+            "please open my time logs, I need to fix yesterday's entries and also file a leave for next week",
+        ]
+        for text in cases:
+            with self.subTest(text=text):
+                self.assertIsNone(self.router.classify(text)[0])
+
+    def test_route_builds_a_tool_call(self):
+        response = self.router.route("open my time logs")
+        self.assertEqual(response.tool_calls[0]["name"], "get_navigation_links")
+        self.assertEqual(response.tool_calls[0]["args"], {"link": "time logs"})
+        self.assertIsNone(self.router.route("thanks"))
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Show me the Leave Requests for this week"), ["leave", "request", "week"])
+        self.assertEqual(tokenize("My activities"), ["activity"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from decimal import Decimal
+
+from tools.scalema_web3.pricing import compute_price_per_share, format_price, parse_amount, parse_currency
+
+
+class ParseAmountTest(unittest.TestCase):
+    def test_amounts(self):
+        cases = [
+            ("PHP 10M", Decimal("10000000")),
+            ("Php10M", Decimal("10000000")),
+            ("PHP10,000,000", Decimal("10000000")),
+            ("P10M", Decimal("10000000")),
+            ("₱2.5 million", Decimal("2500000")),
+            ("10 million pesos", Decimal("10000000")),
+            ("USD 1.5B", Decimal("1500000000")),
+            ("$1,000,000", Decimal("1000000")),
+            ("€ 250,000.50", Decimal("250000.50")),
+            ("500,000 shares", Decimal("500000")),
+            ("500k", Decimal("500000")),
+            ("100K units", Decimal("100000")),
+            ("2 thousand", Decimal("2000")),
+            (".5M", Decimal("500000")),
+        ]
+        for text, amount in cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse_amount(text), amount)
+
+    def test_ambiguous_or_missing(self):
+        for text in ["PHP 5M - PHP 10M", "around 10M for 12 months", "None", "", None, "0 shares", "ten million"]:
+            with self.subTest(text=text):
+                self.assertIsNone(parse_amount(text))
+
+    def test_multiplier_needs_a_word_boundary(self):
+        self.assertEqual(parse_amount("10 months"), Decimal("10"))
+        self.assertEqual(parse_amount("3 big shares"), Decimal("3"))
+
+
+class ParseCurrencyTest(unittest.TestCase):
+    def test_currencies(self):
+        cases = [
+            ("PHP 10M", "PHP"),
+            ("Php10M", "PHP"),
+            ("P10M", "PHP"),
+            ("P 2.5 million", "PHP"),
+            ("₱2.5 million", "PHP"),
+            ("10 million pesos", "PHP"),
+            ("$1,000,000", "USD"),
+            ("USD1M", "USD"),
+            ("€ 250,000", "EUR"),
+            ("10M", None),
+            ("10M p.a.", None),
+            ("PHP 10M or $200k", None),
+        ]
+        for text, currency in cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse_currency(text), currency)
+
+
+class PricePerShareTest(unittest.TestCase):
+    def test_prices(self):
+        cases = [
+            ("PHP 10M", "500,000 shares", "PHP 20.00"),
+            ("Php10M", "500k", "PHP 20.00"),
+            ("PHP10,000,000", "500,000", "PHP 20.00"),
+            ("P10M", "500,000", "PHP 20.00"),
+            ("₱2.5 million", "100k", "PHP 25.00"),
+            ("$1,000,000", "3 shares", "USD 333,333.33"),
+            ("USD 1.5B", "2,000,000 units", "USD 750.00"),
+            ("10M", "4", "2,500,000.00"),
+            ("PHP 10", "10k shares", "PHP 0.001"),
+        ]
+        for funding_goal, available_shares, price in cases:
+            with self.subTest(funding_goal=funding_goal, available_shares=available_shares):
+                self.assertEqual(compute_price_per_share(funding_goal, available_shares), price)
+
+    def test_missing_values(self):
+        self.assertIsNone(compute_price_per_share("PHP 5M - PHP 10M", "100"))
+        self.assertIsNone(compute_price_per_share("PHP 10M", "None"))
+        self.assertIsNone(compute_price_per_share(None, None))
+        self.assertIsNone(compute_price_per_share("PHP 10", "1 billion shares"))
+
+    def test_format_price(self):
+        self.assertEqual(format_price(Decimal("1234.5")), "1,234.50")
+        self.assertEqual(format_price(Decimal("0.0025")), "0.0025")
+
+
+if __name__ == "__main__":
+    unittest.main()
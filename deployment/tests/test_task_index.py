@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from utils import task_index
+
+import settings
+
+
+class TaskIndexTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        for name, value in {"TASK_INDEX_DIR": self.directory, "TASK_INDEX_MIN_TASKS": 3}.items():
+            patcher = mock.patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def rebuild(self, tasks, years_of_experience=3):
+        task_index.rebuild_index("15", tasks, years_of_experience=years_of_experience)
+
+    def test_embeddings_are_normalized(self):
+        vectors = task_index.embed_task_names(["Fix login bug", "Fix the login bug", "Write report", ""])
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertAlmostEqual(float(vectors[0] @ vectors[1]), 1.0, places=5)
+        self.assertLess(float(vectors[0] @ vectors[2]), 0.5)
+        self.assertFalse(vectors[3].any())
+
+    def test_similar_tasks_are_ranked(self):
+        self.rebuild([
+            {"name": "Write weekly report", "duration": "02:00:00"},
+            {"name": "Fix bug in signup", "duration": 3 * 3600},
+            {"name": "Deploy app", "duration": "1 00:30:00"},
+            {"name": "Fix login page bug", "duration": "01:00:00"},
+            {"name": "Lunch", "duration": None},
+        ])
+
+        response = task_index.find_similar_tasks("15", ["Fix login bug"])
+        self.assertEqual(response["years_of_experience"], 3)
+        self.assertEqual(response["target_task_names"], ["Fix login bug"])
+        self.assertEqual(
+            [task["name"] for task in response["similar_task_names"][:2]], ["Fix login page bug", "Fix bug in signup"])
+        durations = {task["name"]: task["duration"] for task in response["similar_task_names"]}
+        self.assertEqual(durations, {"Write weekly report": 2.0, "Fix bug in signup": 3.0,
+                                     "Deploy app": 24.5, "Fix login page bug": 1.0})
+
+    def test_not_enough_tasks(self):
+        self.rebuild([{"name": "Deploy app", "duration": 3600}])
+        self.assertIsNone(task_index.find_similar_tasks("15", ["Deploy"]))
+        self.assertTrue(task_index.is_index_fresh("15"))
+
+    def test_stale_index(self):
+        self.rebuild([{"name": f"Task {i}", "duration": 3600} for i in range(5)])
+        with mock.patch.object(time, "time", return_value=time.time() + settings.TASK_INDEX_MAX_AGE_HOURS * 3600 + 1):
+            self.assertFalse(task_index.is_index_fresh("15"))
+            self.assertIsNone(task_index.find_similar_tasks("15", ["Task 1"]))
+
+    def test_rebuild_replaces_the_matrix(self):
+        self.rebuild([{"name": f"Task {i}", "duration": 3600} for i in range(5)])
+        self.rebuild([{"name": f"Other task {i}", "duration": 3600} for i in range(4)])
+
+        matrices = [name for name in os.listdir(self.directory) if name.endswith(".npy")]
+        self.assertEqual(len(matrices), 1)
+
+        index, vectors = task_index.load_index("15")
+        self.assertEqual(vectors.shape[0], 4)
+        self.assertIn(index["version"], matrices[0])
+
+    def test_tasks_never_pair_with_another_matrix(self):
+        self.rebuild([{"name": f"Task {i}", "duration": 3600} for i in range(5)])
+        with open(os.path.join(self.directory, "15.json")) as file:
+            index = json.load(file)
+        index["version"] = "missing"
+        with open(os.path.join(self.directory, "15.json"), "w") as file:
+            json.dump(index, file)
+
+        self.assertEqual(task_index.load_index("15"), (None, None))
+
+    def test_unexpected_keys(self):
+        self.rebuild([{"name": "Deploy app", "duration": 3600}])
+        self.assertEqual(task_index.load_index("../15"), (None, None))
+        self.assertIsNone(task_index.find_similar_tasks("", ["Deploy"]))
+
+    def test_scheduled_rebuild_runs_once_in_the_background(self):
+        started, release = threading.Event(), threading.Event()
+
+        def fetch_tasks():
+            started.set()
+            release.wait(5)
+            return [{"name": f"Task {i}", "duration": 3600} for i in range(5)]
+
+        self.assertTrue(task_index.schedule_rebuild("15", fetch_tasks, years_of_experience=3))
+        self.assertTrue(started.wait(5))
+        self.assertFalse(task_index.schedule_rebuild("15", fetch_tasks))
+        self.assertFalse(task_index.is_index_fresh("15"))
+
+        release.set()
+        task_index._rebuild_executor.submit(lambda: None).result(5)
+        self.assertTrue(task_index.is_index_fresh("15"))
+
+    def test_scheduled_rebuild_keeps_the_index_without_history(self):
+        self.assertTrue(task_index.schedule_rebuild("15", lambda: []))
+        task_index._rebuild_executor.submit(lambda: None).result(5)
+        self.assertEqual(task_index.load_index("15"), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import math
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from utils.urgency import format_duration, format_ranked_tasks, hours_until, parse_duration, rank_tasks
+
+
+def assignment(title, total_duration=None, **task):
+    return {"total_duration": total_duration, "task": {"title": title, **task}}
+
+
+def in_hours(hours):
+    return (datetime.now(timezone.utc) + timedelta(hours=hours)).isoformat()
+
+
+class ParseDurationTest(unittest.TestCase):
+    def test_durations(self):
+        cases = [
+            (None, 0.0),
+            ("", 0.0),
+            (90, 90.0),
+            (1.5, 1.5),
+            ("00:30:00", 1800.0),
+            ("01:02:03", 3723.0),
+            ("2 01:00:00", 2 * 86400 + 3600.0),
+            ("45", 45.0),
+            ("not a duration", 0.0),
+        ]
+        for value, seconds in cases:
+            with self.subTest(value=value):
+                self.assertEqual(parse_duration(value), seconds)
+
+
+class HelpersTest(unittest.TestCase):
+    def test_hours_until(self):
+        self.assertTrue(math.isnan(hours_until(None)))
+        self.assertAlmostEqual(hours_until(datetime.now(timezone.utc) + timedelta(hours=3)), 3, places=2)
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(59), "0m")
+        self.assertEqual(format_duration(25 * 60), "25m")
+        self.assertEqual(format_duration(2 * 3600 + 5 * 60), "2h 5m")
+
+
+class RankTasksTest(unittest.TestCase):
+    def test_no_tasks(self):
+        self.assertEqual(rank_tasks([]), [])
+        self.assertEqual(format_ranked_tasks([]), "The user has no tasks due today.")
+
+    def test_overdue_before_due_later(self):
+        ranked = rank_tasks([
+            assignment("Later", due_date=in_hours(20)),
+            assignment("Overdue", due_date=in_hours(-1)),
+            assignment("No due date"),
+        ])
+        self.assertEqual([task["task"] for task in ranked], ["Overdue", "No due date", "Later"])
+
+    def test_meeting_first(self):
+        ranked = rank_tasks([assignment("Report", due_date=in_hours(1)), assignment("Standup", is_meeting=True)])
+        self.assertEqual(ranked[0]["task"], "Standup")
+
+    def test_weights_override(self):
+        tasks = [assignment("Report", due_date=in_hours(1)), assignment("Standup", is_meeting=True)]
+        ranked = rank_tasks(tasks, weights={"is_meeting": 0})
+        self.assertEqual(ranked[0]["task"], "Report")
+
+    def test_equal_scores_keep_api_order(self):
+        ranked = rank_tasks([assignment("First"), assignment("Second"), assignment("Third")])
+        self.assertEqual([task["task"] for task in ranked], ["First", "Second", "Third"])
+
+    def test_in_progress(self):
+        ranked = rank_tasks([assignment("New"), assignment("Started", "00:30:00")])
+        self.assertEqual(ranked[0]["task"], "Started")
+        self.assertEqual(ranked[0]["worked"], 1800.0)
+
+
+class FormatRankedTasksTest(unittest.TestCase):
+    def test_details_and_limit(self):
+        ranked = rank_tasks([
+            assignment("Standup", is_meeting=True, is_scheduled_task=True, due_date="2026-01-05T01:00:00Z"),
+            assignment("Report", "01:30:00"),
+            assignment("Email"),
+        ])
+        text = format_ranked_tasks(ranked, limit=2, timezone="Asia/Manila")
+        self.assertEqual(text.splitlines(), [
+            "Tasks due today, most urgent first:",
+            "1. Standup (meeting, scheduled, due 09:00)",
+            "2. Report (1h 30m worked)",
+            "...and 1 more tasks due today.",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,42 +1,24 @@
-from typing import List, Dict
+from typing import Annotated, List, Dict
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-import re
+import hashlib
 
 # Import Langgraph
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
+from langgraph.prebuilt import InjectedStore
+from langgraph.store.base import BaseStore, GetOp
 
 # Import utils
-from utils.models import models
-from api import fetch_weekly_task_estimates
+from utils.models import get_cached_model, resolve_model
+from api import fetch_completed_tasks, fetch_weekly_tasks, fetch_similar_task_estimates
 from utils.configuration import Configuration
+from utils.schemas import TaskEstimates
+from utils.estimation import estimate_tasks_duration_locally, total_interval
+from utils.task_index import find_similar_tasks, is_index_fresh, schedule_rebuild
 
-
-def generate_completion(
-        model, system_prompt: str, user_prompt: str) -> Decimal:
-    """
-        Performs the external API call to OpenAI and returns an integer
-        value for estimated hours
-    """
-    try:
-        response = model.invoke(
-                [SystemMessage(content=system_prompt)] +
-                [HumanMessage(content=user_prompt)]
-            )
-
-        response_content = response.content.strip()
-
-        pattern = r"-?\d*\.\d+|\d+"
-        matches = re.findall(pattern, response_content)
-
-        if matches:
-            last_match = matches[-1]
-
-        return Decimal(last_match)
-
-    except Exception as e:
-        print(e)
+import settings
 
 
 def estimate_tasks_duration(
@@ -45,32 +27,36 @@ def estimate_tasks_duration(
     similar_tasks: List[Dict],
     job_position: str,
     years_of_experience: int,
-) -> Decimal:
+) -> Dict[str, Decimal]:
     """
         Main util function for the API endpoint that generates AI estimation
-        of the total hours required to complete multiple tasks.
+        of the hours required to complete each of multiple tasks in a single call.
+        Returns the estimated hours keyed by task name, empty when the call fails.
     """
 
-    system_template = (
+    # The system prompt is static so that it can be cached by the provider
+    system_prompt = (
         "You are an expert in estimating hours needed to complete any task. I"
-        + " want you to estimate the total hours required to complete the"
-        + " following tasks: {task_names} for a {job_position} with"
-        + " {years_of_experience}  years of experience. Assume that more"
-        + " years of experience means faster task completion."
+        + " want you to estimate the hours required to complete each of the"
+        + " tasks given by the user. Assume that more years of experience"
+        + " means faster task completion."
     )
 
-    system_prompt = system_template.format(
-        task_names=", ".join(task_names),
-        job_position=job_position,
-        years_of_experience=str(years_of_experience),
-    )
-
-    user_prompt = (
-        "Use the following similar tasks as a guide in estimating the"
+    user_template = (
+        "Estimate the hours required to complete each of the following tasks"
+        + " for a {job_position} with {years_of_experience} years of experience:\n"
+        + "{task_list}"
+        + "Use the following similar tasks as a guide in estimating the"
         + " approximate hours needed to complete the tasks (Note that the"
         + " similar tasks are ordered from most similar to least):\n"
     )
 
+    user_prompt = user_template.format(
+        task_list="".join(f"{number}. {task_name}\n" for number, task_name in enumerate(task_names, start=1)),
+        job_position=job_position,
+        years_of_experience=str(years_of_experience),
+    )
+
     for task in similar_tasks:
         user_prompt += (
             " - "
@@ -80,20 +66,86 @@ def estimate_tasks_duration(
             + " hours\n"
         )
 
-    user_prompt += (
-        "I want you to strictly return a decimal with a maximum of only"
-        + " 2 decimal places that represents the estimated total number"
-        + " of hours needed to complete all the given tasks."
-    )
+    user_prompt += "Return exactly one estimate per task, in the same order as the tasks."
+
+    try:
+        result = model.with_structured_output(TaskEstimates, method="json_schema", strict=True).invoke(
+            [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)])
+    except Exception as e:
+        print(e)
+        return {}
+
+    if len(result.hours) != len(task_names):
+        print(f"Expected {len(task_names)} task estimates, got {len(result.hours)}")
+        return {}
+
+    return {
+        task_name: Decimal(f"{hours:.2f}") for task_name, hours in zip(task_names, result.hours) if hours > 0
+    }
+
+
+def task_estimate_key(task: Dict) -> str:
+    """Returns the store key of a task, a changed title is estimated again."""
+
+    return hashlib.sha256(f"{task['id']}:{task['title']}".encode()).hexdigest()
+
+
+def estimate_new_tasks(task_names: List[str], configuration: Configuration) -> Dict[str, Dict]:
+    """Estimates the given tasks only, returns the estimates keyed by task name."""
+
+    response = None
+    if configuration.task_index == "local":
+        response = find_similar_tasks(configuration.user_profile_pk, task_names)
+
+    if response is None:
+        response = fetch_similar_task_estimates({
+            "user_profile_pk": configuration.user_profile_pk,
+            "task_names": task_names
+        })
+        # The index is rebuilt from the whole history once a day, the API response gives the experience
+        if configuration.task_index == "local" and response and not is_index_fresh(configuration.user_profile_pk):
+            form_data = {
+                "user_profile_pk": configuration.user_profile_pk,
+                "workforce_id": configuration.workforce_id,
+                "size_per_request": settings.TASK_INDEX_MAX_TASKS
+            }
+            schedule_rebuild(
+                configuration.user_profile_pk,
+                lambda: fetch_completed_tasks(form_data),
+                years_of_experience=response['years_of_experience']
+            )
+
+    if not response:
+        return {}
 
-    ai_estimated_hours = generate_completion(
-        model, system_prompt, user_prompt)
+    estimate = estimate_tasks_duration_locally(
+        response['target_task_names'],
+        response['similar_task_names'],
+        response['years_of_experience'],
+    )
+    if estimate:
+        return estimate["tasks"]
+
+    if configuration.estimate_fallback != "llm":
+        return {}
+
+    model_name = resolve_model("task_estimator", configuration, silent=True)
+    task_hours = estimate_tasks_duration(
+        get_cached_model(model_name, "task_estimates"),
+        task_names,
+        response['similar_task_names'],
+        configuration.job_position,
+        response['years_of_experience'],
+    )
 
-    return ai_estimated_hours
+    return {task_name: {"hours": float(hours), "source": "model"} for task_name, hours in task_hours.items()}
 
 
 @tool
-def fetch_weekly_task_estimates_summary(config: RunnableConfig) -> str:
+def fetch_weekly_task_estimates_summary(
+    config: RunnableConfig,
+    store: Annotated[BaseStore, InjectedStore()]
+) -> str:
     """
         Provides a summary of the estimated hours required for
         the user's tasks for the week. Use this tool whenever the
@@ -101,11 +153,9 @@ def fetch_weekly_task_estimates_summary(config: RunnableConfig) -> str:
     """
 
     configuration = Configuration.from_runnable_config(config)
-    job_position = configuration.job_position
     user_profile_pk = configuration.user_profile_pk
     workforce_id = configuration.workforce_id
     source = configuration.source
-    node_model = models["tool-calling-model"]
 
     form_data = {
         "workforce_id": workforce_id,
@@ -113,28 +163,68 @@ def fetch_weekly_task_estimates_summary(config: RunnableConfig) -> str:
         "source": source
     }
 
-    response = fetch_weekly_task_estimates(form_data)
-
-    if response:
-        ai_estimation_hours = estimate_tasks_duration(
-            node_model,
-            response['target_task_names'],
-            response['similar_task_names'],
-            job_position,
-            response['years_of_experience'],
+    tasks = fetch_weekly_tasks(form_data)
+
+    # Estimates are kept per task so only new or renamed tasks are estimated
+    namespace = ("task_estimates", user_profile_pk)
+    keys = [task_estimate_key(task) for task in tasks]
+    now = datetime.now(timezone.utc)
+
+    # Estimates of the model are refreshed sooner, the history may have become enough to estimate locally
+    task_estimates = {}
+    for key, item in zip(keys, store.batch([GetOp(namespace, key) for key in keys])):
+        if not item:
+            continue
+        ttl_hours = settings.TASK_ESTIMATE_TTL_HOURS
+        if item.value.get("source") == "model":
+            ttl_hours = settings.TASK_ESTIMATE_MODEL_TTL_HOURS
+        if item.updated_at > now - timedelta(hours=ttl_hours):
+            task_estimates[key] = item.value
+
+    # Tasks can share a title, each title is estimated once and stored under all of their keys
+    new_tasks = {}
+    for task, key in zip(tasks, keys):
+        if key not in task_estimates:
+            new_tasks.setdefault(task["title"], []).append(key)
+
+    if new_tasks:
+        for task_name, estimate in estimate_new_tasks(list(new_tasks), configuration).items():
+            for key in new_tasks.get(task_name, []):
+                store.put(namespace, key, estimate)
+                task_estimates[key] = estimate
+
+    estimates = [task_estimates[key] for key in keys if key in task_estimates]
+    ai_estimation_hours = Decimal(f"{sum(e['hours'] for e in estimates):.2f}")
+    interval, missing = "", ""
+
+    # Tasks without an estimate are left out of the total, the user is told how many
+    if len(estimates) < len(keys):
+        missing = ESTIMATES_MISSING_MESSAGE.format(missing=len(keys) - len(estimates), total=len(keys))
+
+    # The interval is only known when every task was estimated locally
+    bounds = total_interval(estimates) if len(estimates) == len(keys) else None
+    if bounds:
+        interval = ESTIMATES_INTERVAL_MESSAGE.format(
+            level=round(settings.ESTIMATE_CONFIDENCE_LEVEL * 100),
+            low=bounds[0],
+            high=bounds[1]
         )
-    else:
-        ai_estimation_hours = 0
 
-    # Temporary workaround: force the LLM to format its reply cleanly by
-    # injecting a “system_message” instruction into the tool output.
-    # Because LangGraph currently auto-prepends the raw tool return value
-    return {
-        "ai_estimation_hours": ai_estimation_hours,
-        "system_message": (
-            "If the user has tasks, start your reply with a blank space and the word 'Hours' "
-            "right after. Proceed to construct your response."
-            "Example: ' Hours. *Insert LLM Response*'"
-            "If the user doesn't have any tasks, just send your response immediately."
-        )
-    }
+    return ESTIMATES_TOOL_MESSAGE.format(ai_estimation_hours=ai_estimation_hours, interval=interval, missing=missing)
+
+
+# Temporary workaround: force the LLM to format its reply cleanly by
+# injecting an instruction into the tool output.
+ESTIMATES_TOOL_MESSAGE = (
+    "Estimated hours for the week: {ai_estimation_hours}{interval}\n{missing}"
+    "If the user has tasks, start your reply with a blank space and the word 'Hours' "
+    "right after. Example: ' Hours. *Insert LLM Response*'. "
+    "If the user doesn't have any tasks, just send your response immediately."
+)
+
+ESTIMATES_INTERVAL_MESSAGE = " ({level}% confidence interval: {low} to {high} hours)"
+
+ESTIMATES_MISSING_MESSAGE = (
+    "{missing} of the {total} tasks could not be estimated and are not included in the hours above, "
+    "tell the user about them.\n"
+)
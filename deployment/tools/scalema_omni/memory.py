@@ -1,22 +1,22 @@
-from typing import List
+from typing import List, Optional
 import uuid
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 
 from langchain_core.tools import tool
 from langchain_core.documents import Document
-from langchain_openai.embeddings import OpenAIEmbeddings
 
 # TODO: Migrate PGVector
 # https://github.com/langchain-ai/langchain-postgres/blob/main/examples/migrate_pgvector_to_pgvectorstore.ipynb
 from langchain.vectorstores.pgvector import PGVector, DistanceStrategy
 from langgraph.graph import MessagesState
-from langchain_core.messages import get_buffer_string, RemoveMessage, SystemMessage
-from trustcall import create_extractor
+from langchain_core.messages import RemoveMessage, SystemMessage, HumanMessage
+from utils.trustcall import extract_structured
 
 from utils.configuration import Configuration, RunnableConfig
+from utils.context import safe_tail
+from utils.models import embeddings, resolve_model
 from utils.tokenizer import get_tokenizer
-from utils.models import models
 
 # import settings
 import settings
@@ -24,6 +24,7 @@ import settings
 
 class MemoryInstance(BaseModel):
     memory: str = Field(default=None, description="Instance of memory.")
+    id: Optional[str] = Field(default=None, description="Id of the memory in the recall store.")
 
 
 class Memories(BaseModel):
@@ -33,8 +34,42 @@ class Memories(BaseModel):
     )
 
 
+class MemoryUpdate(BaseModel):
+    memory: str = Field(description="New or updated memory.")
+    replaces: Optional[int] = Field(
+        default=None, description="Number of the existing memory this one updates, null for a new memory.")
+
+
+class MemoryUpdates(BaseModel):
+    updates: List[MemoryUpdate] = Field(
+        default_factory=list,
+        description="Only the memories that are new or changed, unchanged memories are left out."
+    )
+
+
 class MemoryState(MessagesState):
     memories: Memories
+    summary: str
+
+
+def build_recall_query(messages: list, strategy: str = "recent", summary: str = "") -> str:
+    """
+        Builds the similarity query used for recalling memories. Only the tail of
+        the conversation is read so that the query stays small regardless of the
+        thread length.
+    """
+
+    if strategy == "summary" and summary:
+        return summary
+
+    human_turns = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage) and message.content:
+            human_turns.append(message.text())
+            if len(human_turns) >= settings.MEMORY_QUERY_HUMAN_TURNS:
+                break
+
+    return "\n".join(reversed(human_turns))
 
 
 def memory_summarizer(state: MemoryState, config: RunnableConfig) -> MemoryState:
@@ -44,34 +79,51 @@ def memory_summarizer(state: MemoryState, config: RunnableConfig) -> MemoryState
     """
 
     configuration = Configuration.from_runnable_config(config)
-    model_name = configuration.model_name
-    node_model = models[model_name]
+    model_name = resolve_model("memory_extractor", configuration)
+    user_profile_pk = configuration.user_profile_pk
 
     messages = state["messages"]
     memories = state["memories"]
-    tool_name = "MemoryInstance"
 
-    existing_memories = [(tool_name, m) for m in memories]
-
-    memory_extractor = create_extractor(
-        node_model,
-        tools=[MemoryInstance],
-        tool_choice=tool_name
+    # The model only returns new or changed memories, so its output does not grow with the memory count
+    existing_memories = "\n".join(f"{number}. {m.memory}" for number, m in enumerate(memories, start=1))
+    result = extract_structured(
+        model_name,
+        MemoryUpdates,
+        [SystemMessage(content=SUMMARY_MESSAGE)] + messages
+        + [SystemMessage(content=EXISTING_MEMORIES_MESSAGE.format(memories=existing_memories or "None"))]
     )
-    result = memory_extractor.invoke(
-        {"messages": [SystemMessage(content=SUMMARY_MESSAGE)] + messages,
-         "existing": existing_memories})
 
+    # Only save the memories that were added or changed, updates overwrite the memory they refer to
+    memory_list = list(memories)
+    existing_texts = {m.memory for m in memories}
     extracted_memories = []
-    for r in result['responses']:
-        extracted_memories.append(save_recall_memory.invoke(r.memory, config))
+    for update in result.updates:
+        if not update.memory or update.memory in existing_texts:
+            continue
+
+        extracted_memories.append(update.memory)
+        if update.replaces is not None and 1 <= update.replaces <= len(memories):
+            memory_id = save_memory_document(update.memory, user_profile_pk, memories[update.replaces - 1].id)
+            memory_list[update.replaces - 1] = MemoryInstance(memory=update.memory, id=memory_id)
+        else:
+            memory_id = save_memory_document(update.memory, user_profile_pk)
+            memory_list.append(MemoryInstance(memory=update.memory, id=memory_id))
 
     # Delete all previous messages since action has already been summarized
-    removed_messages = [RemoveMessage(id=m.id) for m in messages[:-settings.MODEL_HISTORY_LENGTH]]
+    # The kept tail never starts in the middle of a group of tool messages
+    kept_messages = safe_tail(messages, settings.MODEL_HISTORY_LENGTH)
+    removed_messages = [RemoveMessage(id=m.id) for m in messages[:len(messages) - len(kept_messages)]]
+
+    # Keep a rolling summary of the latest memories which can be used as a recall query
+    tokenizer = get_tokenizer(model_name)
+    summary = "\n".join(filter(None, [state.get("summary", "")] + extracted_memories))
+    summary = tokenizer.decode(tokenizer.encode(summary)[-settings.MEMORY_QUERY_TOKEN_LIMIT:])
 
     return {
         "messages": removed_messages,
-        "memories": memories + [MemoryInstance(memory=m) for m in extracted_memories]
+        "memories": memory_list,
+        "summary": summary
     }
 
 
@@ -90,38 +142,61 @@ def load_memory(state: MemoryState, config: RunnableConfig) -> MemoryState:
     model_name = configuration.model_name
     tokenizer = get_tokenizer(model_name)
 
-    convo_str = get_buffer_string(state["messages"])
-    convo_str = tokenizer.decode(tokenizer.encode(convo_str)[:2048])
-    recall_memories = search_recall_memories.invoke(convo_str, config)
+    query = build_recall_query(
+        state["messages"],
+        strategy=configuration.memory_query_strategy,
+        summary=state.get("summary", "")
+    )
+    if not query:
+        return {"memories": memories}
+
+    # Keep the newest part of the query if it is still too long
+    query = tokenizer.decode(tokenizer.encode(query)[-settings.MEMORY_QUERY_TOKEN_LIMIT:])
+    recall_memories = search_recall_memories.invoke(query, config)
     return {
         "memories": memories + recall_memories
     }
 
 
-@tool
-def save_recall_memory(memory: str, config: RunnableConfig) -> str:
+def save_memory_document(memory: str, user_profile_pk: str, memory_id: Optional[str] = None) -> str:
     """
-        Save memory to vectorstore for later semantic retrieval.
+        Saves the memory to the vectorstore and returns its id. Given the id of a saved
+        memory, the memory is overwritten so the old version is no longer recalled.
     """
 
-    configuration = Configuration.from_runnable_config(config)
-    user_profile_pk = configuration.user_profile_pk
-    id = str(uuid.uuid4())
+    if memory_id:
+        recall_vector_store.delete(ids=[memory_id], collection_only=True)
+    else:
+        memory_id = str(uuid.uuid4())
 
     timestamp = datetime.now().isoformat()
 
+    # The id is also kept in the metadata, search results do not carry the id of the document
     doc = Document(
         page_content=memory,
-        id=id,
+        id=memory_id,
         metadata={
             "user_profile_pk": user_profile_pk,
             "timestamp": timestamp,
-            "type": "memory"
+            "type": "memory",
+            "memory_id": memory_id
         }
     )
 
     recall_vector_store.add_documents([doc])
 
+    return memory_id
+
+
+@tool
+def save_recall_memory(memory: str, config: RunnableConfig) -> str:
+    """
+        Save memory to vectorstore for later semantic retrieval.
+    """
+
+    configuration = Configuration.from_runnable_config(config)
+    save_memory_document(memory, configuration.user_profile_pk)
+
     return memory
 
 
@@ -146,10 +221,11 @@ def search_recall_memories(query: str, config: RunnableConfig) -> List[str]:
         }
     )
 
-    return [MemoryInstance(memory=document.page_content) for document in documents]
-
+    return [
+        MemoryInstance(memory=document.page_content, id=document.metadata.get("memory_id"))
+        for document in documents
+    ]
 
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
 
 recall_vector_store = PGVector(
     collection_name=settings.COLLECTION_NAME,
@@ -176,3 +252,10 @@ SUMMARY_MESSAGE = (
     "- User asked for their task estimates and the system provided an estimate of 1.23 hours to complete.\n"
     "Below is the conversation history:\n"
 )
+
+EXISTING_MEMORIES_MESSAGE = (
+    "These memories are already saved:\n"
+    "{memories}\n\n"
+    "Only return memories that are new or that change one of the saved memories. When a memory changes a saved "
+    "one, set `replaces` to the number of the saved memory. Return an empty list when nothing changed."
+)
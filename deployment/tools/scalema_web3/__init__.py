@@ -1 +1,2 @@
 from .calculator import *
+from .pricing import *
@@ -0,0 +1,80 @@
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+
+MULTIPLIERS = {
+    "k": 10 ** 3, "thousand": 10 ** 3,
+    "m": 10 ** 6, "mn": 10 ** 6, "mil": 10 ** 6, "million": 10 ** 6,
+    "b": 10 ** 9, "bn": 10 ** 9, "billion": 10 ** 9,
+    "t": 10 ** 12, "trillion": 10 ** 12,
+}
+
+CURRENCIES = {
+    "₱": "PHP", "p": "PHP", "php": "PHP", "peso": "PHP", "pesos": "PHP",
+    "$": "USD", "usd": "USD", "dollar": "USD", "dollars": "USD",
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "£": "GBP", "gbp": "GBP",
+    "¥": "JPY", "jpy": "JPY", "yen": "JPY",
+}
+
+NUMBER_PATTERN = re.compile(
+    r"(?<![\d.])(\d[\d,]*(?:\.\d+)?|\.\d+)\s*(" + "|".join(sorted(MULTIPLIERS, key=len, reverse=True)) + r")?\b",
+    re.IGNORECASE
+)
+# A lone "P" only stands for pesos right before an amount, like in "P10M"
+CURRENCY_PATTERN = re.compile(r"[₱$€£¥]|(?<![a-z])p(?=\s?\d)|(?<![a-z])[a-z]{2,}(?![a-z])", re.IGNORECASE)
+
+
+def parse_amount(text: Optional[str]) -> Optional[Decimal]:
+    """
+        Reads a single positive amount from free text such as "PHP 10M", "Php10M",
+        "PHP10,000,000", "P10M", "₱2.5 million" or "500,000 shares". Returns `None`
+        when there is no amount or more than one, like in ranges, so the value is
+        never guessed.
+    """
+
+    matches = NUMBER_PATTERN.findall(str(text or ""))
+    if len(matches) != 1:
+        return None
+
+    number, multiplier = matches[0]
+    try:
+        amount = Decimal(number.replace(",", "")) * MULTIPLIERS.get(multiplier.lower(), 1)
+    except InvalidOperation:
+        return None
+
+    return amount if amount > 0 else None
+
+
+def parse_currency(text: Optional[str]) -> Optional[str]:
+    """Returns the ISO code of the single currency mentioned in the text, if any."""
+
+    currencies = {
+        CURRENCIES[token.lower()] for token in CURRENCY_PATTERN.findall(str(text or "")) if token.lower() in CURRENCIES
+    }
+    return currencies.pop() if len(currencies) == 1 else None
+
+
+def format_price(price: Decimal) -> str:
+    """Formats to cents, prices below a cent keep up to six decimals."""
+
+    if price >= Decimal("0.01"):
+        return f"{price.quantize(Decimal('0.01')):,}"
+    return f"{price.quantize(Decimal('0.000001')).normalize():f}"
+
+
+def compute_price_per_share(funding_goal: Optional[str], available_shares: Optional[str]) -> Optional[str]:
+    """
+        Returns the price of one share in the currency of the funding goal, or `None`
+        when either value cannot be read unambiguously or the price rounds to zero.
+    """
+
+    goal = parse_amount(funding_goal)
+    shares = parse_amount(available_shares)
+    if goal is None or shares is None or goal / shares < Decimal("0.000001"):
+        return None
+
+    price = format_price(goal / shares)
+    currency = parse_currency(funding_goal)
+    return f"{currency} {price}" if currency else price
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict, defaultdict
+from threading import Lock
+from typing import Optional
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+from psycopg_pool import ConnectionPool
+
+import settings
+
+
+CREATE_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS llm_response_cache (
+        key TEXT PRIMARY KEY,
+        site TEXT NOT NULL,
+        response TEXT NOT NULL,
+        expires_at DOUBLE PRECISION NOT NULL
+    )
+"""
+CREATE_INDEX_QUERY = "CREATE INDEX IF NOT EXISTS llm_response_cache_expires_at ON llm_response_cache (expires_at)"
+LOOKUP_QUERY = "SELECT response FROM llm_response_cache WHERE key = %s AND expires_at > %s"
+UPDATE_QUERY = """
+    INSERT INTO llm_response_cache (key, site, response, expires_at) VALUES (%s, %s, %s, %s)
+    ON CONFLICT (key) DO UPDATE SET response = EXCLUDED.response, expires_at = EXCLUDED.expires_at
+"""
+CLEAR_QUERY = "DELETE FROM llm_response_cache WHERE site = %s"
+PURGE_QUERY = "DELETE FROM llm_response_cache WHERE expires_at <= %s"
+
+_pool = None
+_pool_failed_at = 0.0
+_pool_lock = Lock()
+_purged_at = 0.0
+
+
+def get_pool() -> ConnectionPool:
+    """
+        Returns the connection pool of the persistent cache, the table is created on
+        first use. After a failed connection the in-memory cache is used on its own
+        for a while instead of waiting on the database on every call.
+    """
+
+    global _pool, _pool_failed_at
+
+    with _pool_lock:
+        if _pool is None:
+            if time.time() - _pool_failed_at < settings.RESPONSE_CACHE_RETRY_SECONDS:
+                raise ConnectionError("The persistent response cache is unavailable")
+
+            pool = ConnectionPool(
+                settings.POSTGRES_URI, max_size=4, timeout=5, kwargs={"autocommit": True}, open=False)
+            try:
+                pool.open(wait=True, timeout=5)
+                with pool.connection() as conn:
+                    conn.execute(CREATE_TABLE_QUERY)
+                    conn.execute(CREATE_INDEX_QUERY)
+            except Exception:
+                _pool_failed_at = time.time()
+                pool.close()
+                raise
+            _pool = pool
+
+    return _pool
+
+
+def purge_expired(conn):
+    """Deletes the expired responses of every site at most once every `RESPONSE_CACHE_PURGE_SECONDS`."""
+
+    global _purged_at
+
+    with _pool_lock:
+        now = time.time()
+        if now - _purged_at < settings.RESPONSE_CACHE_PURGE_SECONDS:
+            return
+        _purged_at = now
+
+    conn.execute(PURGE_QUERY, (now,))
+
+
+class ResponseCache(BaseCache):
+    """
+        Exact-match cache of model responses for a single call site. Responses are
+        keyed by a hash of the model, its parameters and tools, and the messages.
+        Entries are kept in an in-memory LRU backed by a Postgres table, and expire
+        after the TTL of the site.
+    """
+
+    def __init__(self, site: str, ttl: float, max_size: int = settings.RESPONSE_CACHE_MAX_SIZE):
+        self.site = site
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = Lock()
+        self.entries = OrderedDict()
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{self.site}\0{llm_string}\0{prompt}".encode()).hexdigest()
+
+    def _remember(self, key: str, response: str, expires_at: float):
+        with self.lock:
+            self.entries[key] = (response, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[list]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+
+        with self.lock:
+            response, expires_at = self.entries.get(key, (None, 0))
+            if response is not None and expires_at > now:
+                self.entries.move_to_end(key)
+            else:
+                response = None
+
+        source = "memory_hits"
+        if response is None:
+            source = "persistent_hits"
+            try:
+                with get_pool().connection() as conn:
+                    row = conn.execute(LOOKUP_QUERY, (key, now)).fetchone()
+                if row:
+                    response = row[0]
+                    self._remember(key, response, now + self.ttl)
+            except Exception as e:
+                print(f"Response cache lookup failed: {e}")
+
+        if response is None:
+            record_cache_lookup(self.site, "misses")
+            return None
+
+        record_cache_lookup(self.site, source)
+        messages = messages_from_dict(json.loads(response))
+        # No tokens were spent on a cached response
+        for message in messages:
+            message.usage_metadata = None
+
+        return [ChatGeneration(message=message) for message in messages]
+
+    def update(self, prompt: str, llm_string: str, return_val: list):
+        key = self._key(prompt, llm_string)
+        response = json.dumps([message_to_dict(generation.message) for generation in return_val])
+        expires_at = time.time() + self.ttl
+
+        self._remember(key, response, expires_at)
+        try:
+            with get_pool().connection() as conn:
+                conn.execute(UPDATE_QUERY, (key, self.site, response, expires_at))
+                purge_expired(conn)
+        except Exception as e:
+            print(f"Response cache update failed: {e}")
+
+    def clear(self, **kwargs):
+        with self.lock:
+            self.entries.clear()
+        with get_pool().connection() as conn:
+            conn.execute(CLEAR_QUERY, (self.site,))
+
+
+_stats_lock = Lock()
+cache_stats = defaultdict(lambda: {"memory_hits": 0, "persistent_hits": 0, "misses": 0})
+
+
+def record_cache_lookup(site: str, outcome: str):
+    """Counts the cache lookups of a site by outcome."""
+
+    with _stats_lock:
+        cache_stats[site][outcome] += 1
+
+
+def cache_report() -> dict:
+    """Returns the number of lookups per outcome and the hit rate of every site."""
+
+    with _stats_lock:
+        report = {}
+        for site, stats in cache_stats.items():
+            hits = stats["memory_hits"] + stats["persistent_hits"]
+            total = hits + stats["misses"]
+            report[site] = {**stats, "hit_rate": hits / total if total else 0}
+        return report
@@ -0,0 +1,122 @@
+import re
+from threading import Lock
+from typing import Optional
+
+
+YES_NO_STARTERS = (
+    "would", "do", "does", "did", "is", "are", "was", "can", "could", "should",
+    "shall", "will", "may", "have", "has", "am", "want"
+)
+# Phrases asking the user to type in a value rather than pick one
+FREE_FORM_PATTERNS = (
+    r"\bprovide\b", r"\benter\b", r"\bshare\b", r"\bdescribe\b", r"\btell me\b",
+    r"\bwhat (is|are|was|would be|should be|will be)\b", r"\bwhat's\b", r"\bhow (much|many|long)\b",
+    r"\bwhen\b", r"\bwhere\b", r"\bwho\b", r"\bname\b"
+)
+# Phrases asking the user to pick one of the listed items
+PICK_PATTERNS = (
+    r"\bwhich\b", r"\bfollowing\b", r"\boptions?\b", r"\bchoose\b", r"\bselect\b", r"\bpick\b",
+    r"\bprefer\b", r"\bone of\b"
+)
+# Words that usually come right before an "A, B, or C" enumeration
+ENUMERATION_MARKERS = r".*\b(?:between|like|as|be|prefer|choose|either|to|go with|want)\b\s+"
+
+LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.+?)\s*$", re.MULTILINE)
+MAX_CHOICE_WORDS = 6
+
+_stats_lock = Lock()
+choice_stats = {"fast_path": 0, "fallback": 0}
+
+
+def _clean_choice(text: str, drop_description: bool = False) -> str:
+    text = re.sub(r"[*_`]", "", text).strip()
+    if drop_description:
+        # Drop descriptions of listed items such as "Residential: A place to live"
+        text = re.split(r"\s[-–—]\s|:\s", text, maxsplit=1)[0]
+    text = re.sub(r"^(?:a|an|the)\s+", "", text.strip(), flags=re.IGNORECASE)
+    return text.strip(" .,;?!\"'")
+
+
+def _as_choices(texts: list[str]) -> list[dict]:
+    return [{"text": text, "response": text} for text in texts]
+
+
+def _last_question(text: str) -> Optional[str]:
+    questions = re.findall(r"[^.?!\n]*\?", text)
+    return questions[-1].strip() if questions else None
+
+
+def _enumerated_choices(question: str) -> Optional[list[str]]:
+    """Extracts "A, B, or C" enumerations at the end of a question."""
+
+    if " or " not in question:
+        return None
+
+    enumeration = re.sub(ENUMERATION_MARKERS, "", question.rstrip("?"), count=1, flags=re.IGNORECASE)
+    items = [_clean_choice(item) for item in re.split(r",\s*(?:or\s+)?|\s+or\s+", enumeration)]
+    items = [item for item in items if item]
+
+    if len(items) < 2 or any(len(item.split()) > MAX_CHOICE_WORDS for item in items):
+        return None
+
+    # "A or B" without commas can also join two clauses, only accept short items
+    if len(items) == 2 and "," not in enumeration and any(len(item.split()) > 2 for item in items):
+        return None
+
+    return items
+
+
+def extract_choices_locally(text: str) -> Optional[list[dict]]:
+    """
+        Extracts answer choices from an assistant message using simple rules that
+        follow `CHOICE_EXTRACTOR_MESSAGE`. Returns `None` when the message is not
+        clear enough, in which case the model should be used instead.
+    """
+
+    text = (text or "").strip()
+    if not text:
+        return []
+
+    question = _last_question(text)
+    last_paragraph = text.split("\n\n")[-1].lower()
+    asking = (question or last_paragraph).lower()
+
+    # Explicit options listed in the message
+    list_items = [_clean_choice(item, drop_description=True) for item in LIST_ITEM.findall(text)]
+    list_items = [item for item in list_items if item]
+    if len(list_items) >= 2 and any(re.search(p, asking) for p in PICK_PATTERNS):
+        if all(len(item.split()) <= MAX_CHOICE_WORDS for item in list_items):
+            return _as_choices(list_items)
+        return None
+
+    if question is None:
+        # Statements and offers of assistance have no choices, unless options were listed
+        return [] if not list_items else None
+
+    enumerated = _enumerated_choices(question)
+    if enumerated:
+        return _as_choices(enumerated)
+
+    if any(re.search(p, asking) for p in FREE_FORM_PATTERNS):
+        return []
+
+    first_word = asking.split(maxsplit=1)[0] if asking.split() else ""
+    if first_word in YES_NO_STARTERS and " or " not in asking:
+        return _as_choices(["Yes", "No"])
+
+    return None
+
+
+def record_choice_extraction(fast_path: bool):
+    """Counts whether the choices were resolved locally or by the model."""
+
+    with _stats_lock:
+        choice_stats["fast_path" if fast_path else "fallback"] += 1
+
+
+def choice_fast_path_report() -> dict:
+    """Returns the number of extractions per path and the fast path hit rate."""
+
+    with _stats_lock:
+        total = choice_stats["fast_path"] + choice_stats["fallback"]
+        return {**choice_stats, "hit_rate": choice_stats["fast_path"] / total if total else 0}
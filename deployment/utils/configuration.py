@@ -21,6 +21,28 @@ class Configuration:
     job_position: Optional[str] = None
     x_timezone: Optional[str] = None
 
+    # Either "recent" (latest user messages) or "summary" (rolling summary of the thread)
+    memory_query_strategy: str = "recent"
+    # Either "extract" (Trustcall extraction then a reply) or "single_call" (one structured call per turn)
+    card_turn_mode: str = "extract"
+    # Overrides of settings.MODEL_POLICY, maps a node or tool to a tier ("fast", "standard") or a model name
+    model_policy: Optional[dict] = None
+    # Model of the hedged request sent when the agent is slow to answer, hedging is off when not set
+    hedge_model: Optional[str] = None
+    # Either "off", "without_memories" (first turns without recalled memories) or "all" (any first turn)
+    semantic_cache: str = "off"
+    # Either "off" or "local" (common lookups are routed to their tool without the agent model)
+    intent_routing: str = "off"
+    # Either "all" or "embedding" (only the tools relevant to the conversation are bound to the agent). The
+    # subset changes between turns, which costs the cached prompt prefix and an embedding call per turn.
+    tool_selection: str = "all"
+    # Overrides of settings.URGENCY_WEIGHTS
+    urgency_weights: Optional[dict] = None
+    # Either "llm" (the model estimates the tasks when there is not enough history) or "off"
+    estimate_fallback: str = "llm"
+    # Either "local" (similar tasks come from the local task index once it knows enough tasks) or "off"
+    task_index: str = "off"
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
@@ -0,0 +1,45 @@
+from langchain_core.messages import ToolMessage, merge_message_runs, trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
+
+import settings
+
+
+def safe_tail(messages: list, length: int) -> list:
+    """
+        Returns the last `length` messages while making sure that the tail does not
+        start with a tool message whose tool call was cut off (OpenAI responds with
+        a 400 error in that case).
+    """
+
+    start = max(len(messages) - length, 0)
+    while start > 0 and isinstance(messages[start], ToolMessage):
+        start -= 1
+
+    return messages[start:]
+
+
+def assemble_context(system_messages: list, messages: list, model_name: str) -> list:
+    """
+        Assembles the messages sent to a model within the token budget of that model.
+        The oldest messages are dropped first and tool calls are kept together with
+        their tool results.
+    """
+
+    budget = settings.MODEL_CONTEXT_TOKEN_BUDGET.get(model_name, settings.TOKEN_LIMIT_LARGE)
+    budget -= count_tokens_approximately(system_messages)
+
+    trimmed_messages = trim_messages(
+        messages,
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        max_tokens=max(budget, 0),
+        start_on="human",
+        allow_partial=False
+    )
+
+    # Never go below the history that is kept by the memory summarizer
+    history = safe_tail(messages, settings.MODEL_HISTORY_LENGTH)
+    if len(trimmed_messages) < len(history):
+        trimmed_messages = history
+
+    return merge_message_runs(messages=system_messages + trimmed_messages)
@@ -0,0 +1,119 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy import stats
+
+from utils.intents import tokenize
+
+import settings
+
+
+def experience_factor(years_of_experience) -> float:
+    """
+        Returns the multiplier of the historical durations for the experience of the
+        user, historical durations are assumed to be from `ESTIMATE_REFERENCE_YEARS`.
+    """
+
+    try:
+        years = float(years_of_experience)
+    except (TypeError, ValueError):
+        return 1.0
+
+    factor = (1 - settings.ESTIMATE_EXPERIENCE_SPEEDUP) ** (years - settings.ESTIMATE_REFERENCE_YEARS)
+    return float(np.clip(factor, settings.ESTIMATE_EXPERIENCE_MIN_FACTOR, settings.ESTIMATE_EXPERIENCE_MAX_FACTOR))
+
+
+def total_interval(task_estimates: List[Dict]) -> Optional[tuple[Decimal, Decimal]]:
+    """
+        Returns the `ESTIMATE_CONFIDENCE_LEVEL` interval of the total hours of the
+        tasks. Tasks estimated together are weighted means of the same durations, so
+        the variance of their total includes the covariance of every pair of tasks.
+        Tasks estimated apart may still share history, so the standard deviations of
+        the separate estimates are added, as if they were fully correlated. Returns
+        `None` when a task was not estimated locally, like the estimates of the model.
+    """
+
+    if not task_estimates or not all("batch" in e and "weights" in e for e in task_estimates):
+        return None
+
+    batches = defaultdict(list)
+    for e in task_estimates:
+        batches[e["batch"]].append(e)
+
+    deviation, df = 0.0, np.inf
+    for estimates in batches.values():
+        # The variance of a sum of weighted means is the log variance times the squared norm of the summed weights
+        weights = sum(e["hours"] * np.array(e["weights"], dtype=float) for e in estimates)
+        deviation += np.sqrt(estimates[0]["log_variance"] * (weights @ weights))
+        df = min(df, estimates[0]["df"])
+
+    margin = stats.t.ppf(0.5 + settings.ESTIMATE_CONFIDENCE_LEVEL / 2, df=df) * deviation
+    hours = sum(e["hours"] for e in task_estimates)
+
+    return Decimal(f"{max(hours - margin, 0):.2f}"), Decimal(f"{hours + margin:.2f}")
+
+
+def estimate_tasks_duration_locally(
+    task_names: List[str],
+    similar_tasks: List[Dict],
+    years_of_experience: int,
+) -> Optional[Dict]:
+    """
+        Estimates the hours required to complete each task and their total from the
+        durations of the similar tasks without calling a model.
+
+        Every task gets the weighted geometric mean of the historical durations. The
+        weights decay with the rank of the similar task and grow with the overlap of
+        its name with the task. Every estimate keeps its weights and the variance of
+        the log durations, so the interval of any set of tasks can be computed with
+        `total_interval`. Returns `None` when there is not enough history to estimate
+        from.
+    """
+
+    history = []
+    for task in similar_tasks or []:
+        try:
+            duration = float(task["duration"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if duration > 0:
+            history.append((set(tokenize(task["name"])), duration))
+
+    if not task_names or len(history) < settings.ESTIMATE_MIN_HISTORY:
+        return None
+
+    log_durations = np.log([duration for _, duration in history])
+    rank_weights = settings.ESTIMATE_RANK_DECAY ** np.arange(len(history))
+    log_variance = float(np.var(log_durations, ddof=1))
+    factor = experience_factor(years_of_experience)
+    batch = uuid.uuid4().hex
+
+    task_estimates = {}
+    for task_name in task_names:
+        tokens = set(tokenize(task_name))
+        similarity = np.array([
+            len(tokens & history_tokens) / len(tokens | history_tokens) if tokens | history_tokens else 0.0
+            for history_tokens, _ in history
+        ])
+        weights = rank_weights * (settings.ESTIMATE_SIMILARITY_FLOOR + similarity)
+        weights /= weights.sum()
+
+        # The spread of the log mean is carried over to hours with the delta method in `total_interval`
+        task_estimates[task_name] = {
+            "hours": round(float(np.exp(weights @ log_durations) * factor), 2),
+            "weights": weights.tolist(),
+            "log_variance": log_variance,
+            "df": len(history) - 1,
+            "batch": batch,
+        }
+
+    low, high = total_interval(list(task_estimates.values()))
+    return {
+        "hours": Decimal(f"{sum(e['hours'] for e in task_estimates.values()):.2f}"),
+        "low": low,
+        "high": high,
+        "tasks": task_estimates,
+    }
@@ -0,0 +1,174 @@
+import time
+from collections import defaultdict, deque
+from concurrent.futures import wait, FIRST_COMPLETED
+from threading import Lock
+from typing import Callable
+
+from langchain_core.callbacks import CallbackManager
+from langchain_core.messages import message_chunk_to_message
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, LLMResult
+from langchain_core.runnables.config import ContextThreadPoolExecutor, ensure_config
+
+from utils.models import SilentHandler
+
+import settings
+
+
+class LatencyWindow:
+    """
+        Rolling window of the latest call latencies, used to decide when a call is
+        slow enough to be hedged.
+    """
+
+    def __init__(self, size: int = settings.HEDGE_WINDOW_SIZE):
+        self.lock = Lock()
+        self.latencies = deque(maxlen=size)
+
+    def record(self, latency: float):
+        with self.lock:
+            self.latencies.append(latency)
+
+    def deadline(self) -> float:
+        """Returns the latency quantile of the window, or the default until enough calls were seen."""
+
+        with self.lock:
+            latencies = sorted(self.latencies)
+
+        if len(latencies) < settings.HEDGE_MIN_SAMPLES:
+            return settings.HEDGE_DEFAULT_DEADLINE_SECONDS
+
+        index = min(int(len(latencies) * settings.HEDGE_LATENCY_QUANTILE), len(latencies) - 1)
+        return max(latencies[index], settings.HEDGE_MIN_DEADLINE_SECONDS)
+
+
+_stats_lock = Lock()
+latency_windows = defaultdict(LatencyWindow)
+hedge_stats = defaultdict(lambda: {"calls": 0, "hedged": 0, "hedge_wins": 0})
+
+
+def record_hedge(site: str, hedged: bool, hedge_won: bool = False):
+    """Counts the calls of a site, how many of them were hedged and how many the hedge won."""
+
+    with _stats_lock:
+        stats = hedge_stats[site]
+        stats["calls"] += 1
+        stats["hedged"] += hedged
+        stats["hedge_wins"] += hedge_won
+
+
+def hedge_report() -> dict:
+    """Returns the hedge rate, the hedge win rate and the current deadline per site."""
+
+    with _stats_lock:
+        return {
+            site: {
+                **stats,
+                "hedge_rate": stats["hedged"] / stats["calls"] if stats["calls"] else 0,
+                "hedge_win_rate": stats["hedge_wins"] / stats["hedged"] if stats["hedged"] else 0,
+                "deadline": latency_windows[site].deadline(),
+            }
+            for site, stats in hedge_stats.items()
+        }
+
+
+def _start_reply_run(messages: list):
+    """Starts a chat model run on the callbacks of the graph run, used to stream the chosen reply."""
+
+    config = ensure_config()
+    manager = CallbackManager.configure(
+        config.get("callbacks"),
+        inheritable_tags=config.get("tags"),
+        inheritable_metadata=config.get("metadata"),
+    )
+    return manager.on_chat_model_start({}, [messages], name="hedged_invoke")[0]
+
+
+def _stream_if_claimed(model, messages: list, claim: Callable[[], bool]):
+    """
+        Streams the response silently and claims the reply on the first chunk. The
+        request that claims the reply forwards its chunks to the callbacks of the run,
+        the other one closes its stream and returns `None`. Closing the stream closes
+        the HTTP response, so the provider stops generating the rest of the reply.
+    """
+
+    response, run = None, None
+    stream = model.stream(messages, {"callbacks": [SilentHandler()]})
+    try:
+        for chunk in stream:
+            if run is None:
+                if not claim():
+                    return None
+                run = _start_reply_run(messages)
+            run.on_llm_new_token(chunk.text(), chunk=ChatGenerationChunk(message=chunk))
+            response = chunk if response is None else response + chunk
+    except BaseException as e:
+        if run is not None:
+            run.on_llm_error(e)
+        raise
+    finally:
+        stream.close()
+
+    if response is None:
+        raise ValueError("The model returned an empty response")
+
+    message = message_chunk_to_message(response)
+    run.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+    return message
+
+
+def hedged_invoke(site: str, model, hedge_model, messages: list):
+    """
+        Invokes the model and, when it has not started answering by the p95 latency of
+        the site, sends the same messages to `hedge_model` and returns whichever starts
+        answering first.
+
+        Only the request that streams the first chunk streams to the user, the other is
+        cancelled at its next chunk, so the user never sees two different replies. A
+        request that fails before streaming falls back to the other one.
+    """
+
+    window = latency_windows[site]
+    executor = ContextThreadPoolExecutor(max_workers=2)
+    claim_lock = Lock()
+    claimed_by = []
+
+    def claim(request: str) -> bool:
+        with claim_lock:
+            if not claimed_by:
+                claimed_by.append(request)
+            return claimed_by[0] == request
+
+    def record_latency(future):
+        # Only complete replies are recorded, a cancelled request did not run to the end
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            window.record(time.perf_counter() - started_at)
+
+    try:
+        started_at = time.perf_counter()
+        primary = executor.submit(_stream_if_claimed, model, messages, lambda: claim("primary"))
+        primary.add_done_callback(record_latency)
+
+        # A primary that already streams to the user is never hedged
+        done, _ = wait([primary], timeout=window.deadline())
+        with claim_lock:
+            streaming = bool(claimed_by)
+        if done or streaming:
+            record_hedge(site, hedged=False)
+            return primary.result()
+
+        hedge = executor.submit(_stream_if_claimed, hedge_model, messages, lambda: claim("hedge"))
+
+        error = None
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                elif future.result() is not None:
+                    record_hedge(site, hedged=True, hedge_won=future is hedge)
+                    return future.result()
+
+        raise error
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,190 @@
+import math
+import re
+import uuid
+from collections import Counter
+from typing import Optional
+
+from langchain_core.messages import AIMessage
+
+import settings
+
+
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "mine", "you", "your", "is", "are", "am", "be", "do", "does",
+    "to", "of", "in", "on", "for", "and", "or", "it", "can", "could", "would", "please", "pls", "want",
+    "need", "go", "this", "that", "these", "those", "hi", "hello", "hey", "there", "with", "at", "from",
+    "show", "give", "get", "see", "let", "us", "we", "our", "what", "where", "which", "how", "kindly", "thanks", "thank"
+}
+
+# Words that change what a lookup means, these messages are always left to the model
+NEGATIONS = {"no", "not", "dont", "don't", "never", "stop", "cancel", "without", "nevermind", "instead"}
+GRATITUDE = {"thanks", "thank", "thx", "ty", "appreciate", "appreciated"}
+# Joins two requests in one message, every clause has to route to the same intent
+CLAUSE_SEPARATORS = r"\band\b|\balso\b|\bplus\b|\bthen\b|[,;?!.]"
+
+# Example user messages per intent, an intent is a tool and optionally the navigation link it returns
+INTENT_EXAMPLES = {
+    ("get_navigation_links", "time logs"): [
+        "where are my time logs", "open my timelogs", "time log page", "my timesheet",
+        "where can i log my time", "check my logged hours", "timelog",
+    ],
+    ("get_navigation_links", "leave requests"): [
+        "open my leaves", "file a leave", "leave request page", "request a vacation leave",
+        "where do i apply for sick leave", "my leave requests",
+    ],
+    ("get_navigation_links", "user profile"): [
+        "open my profile", "edit my user profile", "update my profile picture", "profile page",
+    ],
+    ("get_navigation_links", "help center"): [
+        "help center", "open the help center", "support page", "where can i find help articles",
+    ],
+    ("get_navigation_links", "boards"): [
+        "open my boards", "where are the boards", "board page", "kanban board",
+    ],
+    ("get_navigation_links", "career employment"): [
+        "my employment details", "career page", "employment information", "my career info",
+    ],
+    ("get_navigation_links", "milestones"): [
+        "my milestones", "open milestones", "milestones page",
+    ],
+    ("get_navigation_links", "forms"): [
+        "open the forms", "where are the forms", "forms page",
+    ],
+    ("get_navigation_links", "company overview"): [
+        "company overview", "open the company overview", "overview of the company",
+    ],
+    ("fetch_most_urgent_task", None): [
+        "what is my most urgent task", "which task should i focus on", "what should i work on first",
+        "most important task today", "urgent tasks today", "what task should i prioritize",
+    ],
+    ("fetch_tasks_to_complete_this_week", None): [
+        "what are my tasks this week", "tasks due this week", "what do i need to finish this week",
+        "list my tasks for the week", "weekly tasks", "tasks to complete this week",
+    ],
+    ("fetch_weekly_task_estimates_summary", None): [
+        "how many hours will my tasks take this week", "estimate my weekly tasks",
+        "weekly task estimates", "estimated hours for this week", "how long will my tasks take",
+    ],
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases the text and returns its words without stopwords and plural endings."""
+
+    tokens = []
+    for word in re.findall(r"[a-z]+", text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if word.endswith("ies") and len(word) > 4:
+            word = word[:-3] + "y"
+        elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class IntentRouter:
+    """
+        Keyword classifier that maps a user message to a single tool call. Every intent
+        is described by the docstring of its tool and its examples, and messages are
+        compared to them with TF-IDF weighted cosine similarity. An intent scores the
+        best of its whole description and its closest example, so short examples that
+        share few words with the description still match.
+    """
+
+    def __init__(self, tools: list, examples: dict = INTENT_EXAMPLES):
+        descriptions = {tool.get_name(): tool.description for tool in tools}
+        documents = {
+            intent: Counter(tokenize(" ".join([descriptions[intent[0]], intent[1] or ""] + intent_examples)))
+            for intent, intent_examples in examples.items()
+            if intent[0] in descriptions
+        }
+
+        self.document_frequency = Counter(token for document in documents.values() for token in document)
+        self.idf = {
+            token: math.log((1 + len(documents)) / (1 + frequency)) + 1
+            for token, frequency in self.document_frequency.items()
+        }
+        self.vectors = {intent: self._weigh(document) for intent, document in documents.items()}
+        self.example_vectors = {
+            intent: [self._weigh(Counter(tokenize(example))) for example in examples[intent]]
+            for intent in documents
+        }
+
+    def _weigh(self, counts: Counter) -> dict:
+        vector = {
+            token: (1 + math.log(count)) * self.idf[token] for token, count in counts.items() if token in self.idf
+        }
+        norm = math.sqrt(sum(weight ** 2 for weight in vector.values())) or 1
+        return {token: weight / norm for token, weight in vector.items()}
+
+    def _score(self, query: dict, intent: tuple) -> float:
+        return max(
+            sum(weight * vector.get(token, 0) for token, weight in query.items())
+            for vector in [self.vectors[intent]] + self.example_vectors[intent]
+        )
+
+    def classify(self, text: str) -> tuple[Optional[tuple], float]:
+        """
+            Returns the intent that matches the message best and its score. The intent
+            is `None` when the message is too long, negated or thankful, asks for more
+            than one thing, or is too far from every intent or too close to a second one.
+        """
+
+        words = set(re.findall(r"[a-z']+", text.lower()))
+        if not tokenize(text) or len(text.split()) > settings.INTENT_ROUTER_MAX_WORDS:
+            return None, 0.0
+        if words & (NEGATIONS | GRATITUDE) or any(word.endswith("n't") for word in words):
+            return None, 0.0
+
+        clauses = [clause for clause in re.split(CLAUSE_SEPARATORS, text.lower()) if tokenize(clause)]
+        if len(clauses) > 1:
+            intents = {self._classify_clause(clause)[0] for clause in clauses}
+            if len(intents) > 1 or None in intents:
+                return None, 0.0
+
+        return self._classify_clause(text)
+
+    def _classify_clause(self, text: str) -> tuple[Optional[tuple], float]:
+        tokens = tokenize(text)
+        # A single word only decides the intent when no other intent knows it
+        if len(set(tokens)) == 1 and self.document_frequency[tokens[0]] != 1:
+            return None, 0.0
+
+        query = self._weigh(Counter(tokens))
+        scores = sorted(
+            ((self._score(query, intent), intent) for intent in self.vectors),
+            key=lambda score: score[0],
+            reverse=True
+        )
+
+        best_score, best_intent = scores[0]
+        second_score = scores[1][0] if len(scores) > 1 else 0.0
+        if best_score < settings.INTENT_ROUTER_MIN_SCORE:
+            return None, best_score
+        if best_score - second_score < settings.INTENT_ROUTER_MIN_MARGIN:
+            return None, best_score
+
+        # Words the intent does not know about mean the message also asks for something else
+        unknown = sum(token not in self.vectors[best_intent] for token in tokens) / len(tokens)
+        if unknown > settings.INTENT_ROUTER_MAX_UNKNOWN_RATIO:
+            return None, best_score
+
+        return best_intent, best_score
+
+    def route(self, text: str) -> Optional[AIMessage]:
+        """Returns the tool call of the matched intent, or `None` when the model should decide."""
+
+        intent, _ = self.classify(text)
+        if intent is None:
+            return None
+
+        tool_name, link = intent
+        return AIMessage(
+            content="",
+            tool_calls=[{
+                "name": tool_name,
+                "args": {"link": link} if link else {},
+                "id": f"call_{uuid.uuid4().hex}"
+            }]
+        )
@@ -0,0 +1,42 @@
+import json
+import time
+from threading import Lock
+
+from utils.cache import cache_report
+from utils.choices import choice_fast_path_report
+from utils.hedging import hedge_report
+from utils.models import usage_tracker
+from utils.semantic_cache import semantic_cache_report
+
+import settings
+
+
+_log_lock = Lock()
+_last_logged_at = time.monotonic()
+
+
+def metrics_report() -> dict:
+    """Collects the metrics that the optimizations record in this process."""
+
+    return {
+        "model_usage": usage_tracker.report(),
+        "node_usage": usage_tracker.node_report(),
+        "response_cache": cache_report(),
+        "choice_extraction": choice_fast_path_report(),
+        "semantic_cache": semantic_cache_report(),
+        "hedging": hedge_report(),
+    }
+
+
+def log_metrics(force: bool = False):
+    """Prints the metrics report at most once every `METRICS_LOG_INTERVAL_SECONDS`."""
+
+    global _last_logged_at
+
+    with _log_lock:
+        now = time.monotonic()
+        if not force and now - _last_logged_at < settings.METRICS_LOG_INTERVAL_SECONDS:
+            return
+        _last_logged_at = now
+
+    print(f"Metrics: {json.dumps(metrics_report(), default=str)}")
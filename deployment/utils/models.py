@@ -1,14 +1,192 @@
+import time
+from collections import defaultdict
+from threading import Lock
+
 from langchain_openai import ChatOpenAI
+from langchain_openai.embeddings import OpenAIEmbeddings
 from langchain.callbacks.base import BaseCallbackHandler
 
+from utils.cache import ResponseCache
+from utils.configuration import Configuration
+
+import settings
+
+
+class UsageTracker(BaseCallbackHandler):
+    """
+        Records the token usage of every model call per model, including the prompt
+        tokens that were served from the provider's prompt cache.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.usage = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0})
+        self.node_usage = defaultdict(lambda: {"calls": 0, "latency": 0.0, "input_tokens": 0, "output_tokens": 0})
+        # Graph node and start time of the model calls in progress, keyed by run id
+        self.runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node", "unknown")
+
+        with self.lock:
+            self.runs[run_id] = (node, time.perf_counter())
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self.lock:
+            self.runs.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs):
+        with self.lock:
+            node, started_at = self.runs.pop(run_id, ("unknown", None))
+
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage_metadata = getattr(message, "usage_metadata", None)
+                if not usage_metadata:
+                    continue
+
+                model_name = message.response_metadata.get("model_name", "unknown")
+                cached_tokens = usage_metadata.get("input_token_details", {}).get("cache_read", 0)
+
+                with self.lock:
+                    usage = self.usage[model_name]
+                    usage["calls"] += 1
+                    usage["input_tokens"] += usage_metadata.get("input_tokens", 0)
+                    usage["cached_tokens"] += cached_tokens or 0
+                    usage["output_tokens"] += usage_metadata.get("output_tokens", 0)
+
+                    node_usage = self.node_usage[node]
+                    node_usage["calls"] += 1
+                    node_usage["latency"] += time.perf_counter() - started_at if started_at else 0
+                    node_usage["input_tokens"] += usage_metadata.get("input_tokens", 0)
+                    node_usage["output_tokens"] += usage_metadata.get("output_tokens", 0)
+
+    def report(self) -> dict:
+        """Returns the recorded usage per model along with the ratio of cached input tokens."""
+
+        with self.lock:
+            return {
+                model_name: {
+                    **usage,
+                    "cached_ratio": usage["cached_tokens"] / usage["input_tokens"] if usage["input_tokens"] else 0
+                }
+                for model_name, usage in self.usage.items()
+            }
+
+    def node_report(self) -> dict:
+        """Returns the recorded usage per graph node along with the average latency of its calls."""
+
+        with self.lock:
+            return {
+                node: {**usage, "avg_latency": usage["latency"] / usage["calls"] if usage["calls"] else 0}
+                for node, usage in self.node_usage.items()
+            }
+
+
+usage_tracker = UsageTracker()
 
 models = {
-    "gpt-4o": ChatOpenAI(model="gpt-4o", temperature=0, max_retries=3),
-    "gpt-4o-mini": ChatOpenAI(model="gpt-4o-mini", temperature=0, max_retries=3),
-    "tool-calling-model": ChatOpenAI(model="gpt-4o", temperature=0, max_retries=3, disable_streaming=True),
+    "gpt-4o": ChatOpenAI(
+        model="gpt-4o", temperature=0, max_retries=3, stream_usage=True, callbacks=[usage_tracker]),
+    "gpt-4o-mini": ChatOpenAI(
+        model="gpt-4o-mini", temperature=0, max_retries=3, stream_usage=True, callbacks=[usage_tracker]),
+    "tool-calling-model": ChatOpenAI(
+        model="gpt-4o", temperature=0, max_retries=3, disable_streaming=True, callbacks=[usage_tracker]),
+    "tool-calling-model-mini": ChatOpenAI(
+        model="gpt-4o-mini", temperature=0, max_retries=3, disable_streaming=True, callbacks=[usage_tracker]),
+}
+
+embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+
+# Models that do not stream their tokens, used for calls that are not shown to the user
+SILENT_MODELS = {
+    "gpt-4o": "tool-calling-model",
+    "gpt-4o-mini": "tool-calling-model-mini",
 }
 
 
+def resolve_model(site: str, configuration: Configuration, silent: bool = False) -> str:
+    """
+        Returns the name of the model used by a node or tool according to its tier in
+        `settings.MODEL_POLICY`. The policy can be overridden per run through the
+        `model_policy` configurable, with either a tier or a model name per site.
+    """
+
+    tiers = {"standard": configuration.model_name, "fast": settings.FAST_MODEL_NAME}
+
+    policy = {**settings.MODEL_POLICY, **(configuration.model_policy or {})}
+    tier = policy.get(site, "standard")
+    model_name = tiers.get(tier, tier)
+
+    if model_name not in models:
+        print(f"Unknown model '{model_name}' for '{site}', using {configuration.model_name}")
+        model_name = configuration.model_name
+
+    return SILENT_MODELS.get(model_name, model_name) if silent else model_name
+
+
+# Models with tools or an output schema already bound, keyed by (model_name, tools or schema, options)
+bound_models = {}
+# Models with the response cache of a call site, keyed by (model_name, site)
+cached_models = {}
+
+
+def get_bound_model(model_name: str, tools: list, **options):
+    """
+        Returns the model bound with the given tools. Binding converts every tool
+        schema so each combination is only built once and then reused.
+    """
+
+    key = (model_name, tuple(tool.get_name() for tool in tools), tuple(sorted(options.items())))
+    bound_model = bound_models.get(key)
+
+    if bound_model is None:
+        bound_model = bound_models.setdefault(key, models[model_name].bind_tools(tools, **options))
+
+    return bound_model
+
+
+def get_structured_model(model_name: str, schema, **options):
+    """
+        Returns the model configured to respond with the given schema. Like bound
+        models, each combination is only built once and then reused.
+    """
+
+    key = (model_name, schema, tuple(sorted(options.items())))
+    structured_model = bound_models.get(key)
+
+    if structured_model is None:
+        structured_model = bound_models.setdefault(
+            key, models[model_name].with_structured_output(schema, **options))
+
+    return structured_model
+
+
+def get_cached_model(model_name: str, site: str):
+    """
+        Returns the model with the response cache of the given call site, identical
+        calls are then answered from the cache until the TTL of the site expires.
+        Only meant for calls whose answer does not change for the same messages.
+    """
+
+    key = (model_name, site)
+    cached_model = cached_models.get(key)
+
+    if cached_model is None:
+        cache = ResponseCache(site, settings.RESPONSE_CACHE_TTLS.get(site, settings.RESPONSE_CACHE_DEFAULT_TTL))
+        cached_model = cached_models.setdefault(key, models[model_name].model_copy(update={"cache": cache}))
+
+    return cached_model
+
+
+def prebind_models(tools: list, model_names: list = None, **options):
+    """Binds the tools to the models ahead of time, defaults to all models."""
+
+    for model_name in model_names or models:
+        get_bound_model(model_name, tools, **options)
+
+
 class SilentHandler(BaseCallbackHandler):
     """A callback handler that does nothing. Prevents models from streaming tokens."""
     def on_llm_new_token(self, token, **kwargs): pass
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 
@@ -15,10 +17,14 @@ RETURN_MESSAGE = ("The following links are available to the user:\n"
 
 
 @tool
-def get_navigation_links(*args, config: RunnableConfig) -> str:
+def get_navigation_links(link: Optional[str] = None, *, config: RunnableConfig) -> str:
     """
         Fetches links for HQZEN.com
 
+        Args:
+            link: Optional key of the only link to return, e.g. "time logs". All links
+                are returned when it is not given or does not match any link.
+
         Returns:
             A formatted context-aware string containing links for the user to navigate to.
     """
@@ -51,6 +57,7 @@ def get_navigation_links(*args, config: RunnableConfig) -> str:
         {"url": f"{prepend_URL}/overview/{employment_id}",
          "key": "company overview"}
     ]
+    nav_links = [nav_link for nav_link in nav_links if nav_link["key"] == link] or nav_links
     stringified_links = f"{"\n".join([f"  - {link["key"]}: {link["url"]}" for link in nav_links])}"
 
     return RETURN_MESSAGE.format(links=stringified_links)
@@ -1,13 +1,20 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
 from langgraph.graph import MessagesState
-from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.graph.state import CompiledStateGraph
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 from langgraph.types import interrupt
+from langgraph.store.base import BaseStore
 from langchain_core.runnables import RunnableConfig
 
-from trustcall import create_extractor
+from utils.trustcall import extract_structured
 
 from utils.schemas import InputState, Choices
+from utils.choices import extract_choices_locally, record_choice_extraction
 from utils.configuration import Configuration
-from utils.models import models
+from utils.models import resolve_model
 
 
 def fake_node():
@@ -36,48 +43,125 @@ def tool_handler(state: MessagesState):
     return {"messages": tool_call_messages}
 
 
+def private_subgraph(subgraph: CompiledStateGraph, summarize_outcome: Callable[[dict], str]):
+    """
+        Wraps a subgraph so that it runs on its own private message channel. The
+        subgraph only receives the latest user turn and the tool call that routed
+        to it, and only a tool message with the outcome of the subgraph is handed
+        back to the parent graph.
+    """
+
+    def run_subgraph(state: MessagesState, config: RunnableConfig) -> MessagesState:
+        messages = state["messages"]
+        tool_call = messages[-1].tool_calls[0]
+
+        start = 0
+        for index in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[index], HumanMessage):
+                start = index
+                break
+
+        # On resume, the subgraph continues from its own checkpoint and ignores the input
+        result = subgraph.invoke({"messages": messages[start:]}, config)
+
+        return {"messages": [ToolMessage(content=summarize_outcome(result), tool_call_id=tool_call["id"])]}
+
+    return run_subgraph
+
+
+def _last_response(state: MessagesState) -> str:
+    """Returns the text of the last non-empty AI message."""
+
+    return next(
+        (m.text() for m in reversed(state["messages"]) if isinstance(m, AIMessage) and m.content),
+        ""
+    )
+
+
 def input_helper(state: InputState) -> MessagesState:
     """
-        Helper node used for receiving the User's response for HITL.
+        Helper node used for receiving the User's response for HITL. The choices found
+        locally by `choice_extractor_helper` are sent along with the interrupt. When the
+        model is still extracting them, the interrupt tells the client where in the store
+        the choices will be saved instead.
     """
 
     extra_data = state.get("extra_data", {})
     choices = extra_data.get("choices")
+    pending_choices = extra_data.get("pending_choices")
     value = {}
 
     if choices:
         value["choices"] = choices
+    if pending_choices:
+        value["pending_choices"] = pending_choices
 
     user_response = interrupt(value=value)
 
     return {
-        "extra_data": {**extra_data, "choices": []},
+        "extra_data": {**extra_data, "choices": [], "pending_choices": None},
         "messages": [HumanMessage(content=user_response)]
     }
 
 
-def choice_extractor_helper(state: InputState, config: RunnableConfig) -> InputState:
+# Choices the local rules are unsure of are extracted by the model after the interrupt
+_choice_executor = ThreadPoolExecutor(max_workers=4)
+
+
+def _extract_choices_with_model(model_name: str, messages: list) -> list:
+    # Choices are only hints for the UI, failing to extract them must not end the run
+    try:
+        result = extract_structured(
+            model_name,
+            Choices,
+            [SystemMessage(content=CHOICE_EXTRACTOR_MESSAGE)] + messages,
+            enable_inserts=True
+        )
+        return result.model_dump(mode="python").get("choice_selection", [])
+    except Exception as e:
+        print(f"Choice extraction failed: {e}")
+        return []
+
+
+def _store_choices(model_name: str, messages: list, store: BaseStore, namespace: tuple, key: str):
+    """Saves the choices even when there are none, so the client can stop waiting for them."""
+
+    choices = _extract_choices_with_model(model_name, messages)
+    try:
+        store.put(namespace, key, {"choices": choices})
+    except Exception as e:
+        print(f"Saving the extracted choices failed: {e}")
+
+
+def choice_extractor_helper(
+        state: InputState, config: RunnableConfig, *, store: Optional[BaseStore] = None) -> InputState:
     """
-        Currently handles extraction of choices from the previous node.
+        Currently handles extraction of choices from the previous node. Common cases
+        are resolved locally and the model is only used when the rules are unsure.
+
+        The model runs in the background so the interrupt of `input_helper` is not
+        delayed by it. Its choices are saved in the store under the namespace and key
+        given to the client as `pending_choices` in the interrupt.
     """
 
     configurable = Configuration.from_runnable_config(config)
-    model_name = configurable.model_name
+    model_name = resolve_model("choice_extractor", configurable)
 
-    choice_extractor = create_extractor(
-        models[model_name],
-        tools=[Choices],
-        tool_choice="Choices",
-        enable_inserts=True
-    )
-    result = choice_extractor.invoke([SystemMessage(content=CHOICE_EXTRACTOR_MESSAGE)] + state["messages"][-3:])
-    dump = result["responses"][0].model_dump(mode="python").get("choice_selection", [])
+    dump = extract_choices_locally(_last_response(state))
+    record_choice_extraction(fast_path=dump is not None)
+    pending_choices = None
+
+    if dump is None and store is None:
+        dump = _extract_choices_with_model(model_name, state["messages"][-3:])
+    elif dump is None:
+        namespace, key = ("choices", configurable.thread_id), uuid.uuid4().hex
+        _choice_executor.submit(_store_choices, model_name, state["messages"][-3:], store, namespace, key)
+        dump = []
+        pending_choices = {"namespace": list(namespace), "key": key}
 
     extra_data = state.get("extra_data", {})
-    if dump:
-        extra_data["choices"] = dump
 
-    return {"extra_data": extra_data}
+    return {"extra_data": {**extra_data, "choices": dump, "pending_choices": pending_choices}}
 
 
 CHOICE_EXTRACTOR_MESSAGE = (
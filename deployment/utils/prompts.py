@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from langchain_core.messages import SystemMessage
+
+import settings
+
+
+def coarse_timestamp(granularity_minutes: int = settings.PROMPT_TIME_GRANULARITY_MINUTES) -> str:
+    """
+        Returns the current time rounded down to the given granularity. Prompts
+        only change once per period which keeps them cacheable by the provider.
+    """
+
+    now = datetime.now()
+    minute_of_day = now.hour * 60 + now.minute
+    minute_of_day -= minute_of_day % granularity_minutes
+    now = now.replace(hour=minute_of_day // 60, minute=minute_of_day % 60, second=0, microsecond=0)
+
+    return now.strftime("%Y-%m-%d %H:%M")
+
+
+def build_system_message(instructions: str, context: str = "") -> SystemMessage:
+    """
+        Builds a system message out of static instructions followed by the dynamic
+        context. The instructions must not contain any per-user or per-turn values
+        so that they stay a byte-stable prefix which the provider can cache.
+    """
+
+    if not context:
+        return SystemMessage(content=instructions)
+
+    return SystemMessage(content=f"{instructions.rstrip()}\n\n{context.strip()}")
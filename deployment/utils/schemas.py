@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import Field, BaseModel
 
 from langgraph.graph import MessagesState
@@ -33,6 +33,7 @@ class Project(BaseModel):
             - location
             - funding goal
             - available shares
+            - price per share (computed from the funding goal and available shares)
             - minimum viable fund
             - funding date completion,
             - key milestone dates
@@ -55,6 +56,7 @@ class Project(BaseModel):
                     "location": "Legazpi Village, Makati",
                     "funding_goal": "PHP 10M",
                     "available_shares": "500,000 shares",
+                    "price_per_share": "PHP 20.00",
                     "minimum_viable_fund": "PHP 5M - PHP 10M",
                     "funding_date_completion": "2023",
                     "key_milestone_dates": [
@@ -86,6 +88,9 @@ class Project(BaseModel):
     funding_goal: Optional[str] = Field("None", description="Amount needed to complete the project.")
     available_shares: Optional[str] = Field(
         "None", description="Shares of the project available for investment.")
+    price_per_share: Optional[str] = Field(
+        "None",
+        description="Price of one share. Computed from the funding goal and available shares, never extract it.")
     minimum_viable_fund: Optional[str] = Field(
         "None", description="Minimum amount needed to proceed.")
     funding_date_completion: Optional[str] = Field("None", description="Date of completion for funding.")
@@ -137,6 +142,24 @@ class Card(BaseModel):
     is_public: Optional[bool] = Field(True, description="Value that allows the Board Card to be visible on the Board.")
 
 
+class CardTurn(BaseModel):
+    """
+        Result of a single Board Card creation turn. Contains the updated Card details
+        together with the reply to the user and the next action to take.
+    """
+    card: Card = Field(description="The Card details updated with the information given by the user.")
+    reply: str = Field(description="The next message to send to the user. Can be empty when finishing or cancelling.")
+    action: Literal["continue", "finish_process", "cancel_process"] = Field(
+        description=("'finish_process' once the user confirms the Card, 'cancel_process' if the user does not "
+                     "want to continue, else 'continue'.")
+    )
+
+
+class TaskEstimates(BaseModel):
+    """Estimated hours of a list of tasks."""
+    hours: list[float] = Field(description="Estimated hours of every task, in the same order as the given tasks.")
+
+
 # State Schemas
 class InputState(MessagesState):
     extra_data: dict
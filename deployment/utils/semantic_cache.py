@@ -0,0 +1,147 @@
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+from threading import Lock
+from typing import Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict, messages_from_dict
+# TODO: Migrate PGVector together with the recall memories
+from langchain_community.vectorstores.pgvector import PGVector, DistanceStrategy
+
+from utils.configuration import Configuration
+from utils.models import embeddings
+
+import settings
+
+
+@lru_cache(maxsize=1)
+def get_response_store() -> PGVector:
+    """Returns the vector store of cached responses, created on first use."""
+
+    return PGVector(
+        collection_name=settings.SEMANTIC_CACHE_COLLECTION_NAME,
+        connection_string=settings.PGVECTOR_CONNECTION_STRING,
+        embedding_function=embeddings,
+        distance_strategy=DistanceStrategy.COSINE
+    )
+
+
+def cacheable_query(state: dict, configuration: Configuration) -> Optional[str]:
+    """
+        Returns the user message to look up when the turn can be answered from the
+        cache. Only first turns are cached since later replies depend on the rest of
+        the conversation. Turns personalized by memories are skipped unless
+        `semantic_cache` is "all".
+    """
+
+    if configuration.semantic_cache not in ("without_memories", "all"):
+        return None
+
+    messages = state["messages"]
+    if not messages or not isinstance(messages[-1], HumanMessage) or state.get("summary"):
+        return None
+    if sum(isinstance(message, HumanMessage) for message in messages) > 1:
+        return None
+    if state.get("memories") and configuration.semantic_cache != "all":
+        return None
+
+    return messages[-1].text().strip() or None
+
+
+def lookup_response(
+        query: str, configuration: Configuration, model_name: str) -> tuple[Optional[AIMessage], Optional[list]]:
+    """
+        Returns a copy of the closest cached response of the user within the distance
+        threshold, along with the embedding of the query so it can be reused when the
+        response is saved.
+    """
+
+    started_at = time.perf_counter()
+    since = (datetime.now() - timedelta(hours=settings.SEMANTIC_CACHE_TTL_HOURS)).isoformat()
+
+    # The cache is only a shortcut, the model is used when it is unavailable
+    try:
+        embedding = embeddings.embed_query(query)
+        results = get_response_store().similarity_search_with_score_by_vector(
+            embedding,
+            k=1,
+            filter={
+                "user_profile_pk": configuration.user_profile_pk,
+                "model_name": model_name,
+                "timestamp": {"$gte": since},
+                "type": "agent_response"
+            }
+        )
+    except Exception as e:
+        print(f"Semantic cache lookup failed: {e}")
+        return None, None
+
+    response = None
+    if results and results[0][1] <= settings.SEMANTIC_CACHE_MAX_DISTANCE:
+        cached = messages_from_dict([json.loads(results[0][0].metadata["response"])])[0]
+        # Replayed tool calls need their own ids to be answered by new tool messages
+        response = AIMessage(
+            id=str(uuid.uuid4()),
+            content=cached.content,
+            tool_calls=[{**tool_call, "id": f"call_{uuid.uuid4().hex}"} for tool_call in cached.tool_calls]
+        )
+
+    record_semantic_lookup(hit=response is not None, latency=time.perf_counter() - started_at)
+    return response, embedding
+
+
+def save_response(query: str, embedding: list, response: AIMessage, configuration: Configuration, model_name: str):
+    """Saves the response of the agent under the embedding of the user message."""
+
+    try:
+        get_response_store().add_embeddings(
+            texts=[query],
+            embeddings=[embedding],
+            metadatas=[{
+                "user_profile_pk": configuration.user_profile_pk,
+                "model_name": model_name,
+                "timestamp": datetime.now().isoformat(),
+                "type": "agent_response",
+                "response": json.dumps(message_to_dict(response))
+            }],
+            ids=[str(uuid.uuid4())]
+        )
+    except Exception as e:
+        print(f"Semantic cache update failed: {e}")
+
+
+_stats_lock = Lock()
+semantic_cache_stats = {"hits": 0, "misses": 0, "lookup_latency": 0.0, "model_calls": 0, "model_latency": 0.0}
+
+
+def record_semantic_lookup(hit: bool, latency: float):
+    """Counts the lookups of the cache and their latency."""
+
+    with _stats_lock:
+        semantic_cache_stats["hits" if hit else "misses"] += 1
+        semantic_cache_stats["lookup_latency"] += latency
+
+
+def record_model_call(latency: float):
+    """Records the latency of a model call made after a cache miss."""
+
+    with _stats_lock:
+        semantic_cache_stats["model_calls"] += 1
+        semantic_cache_stats["model_latency"] += latency
+
+
+def semantic_cache_report() -> dict:
+    """Returns the hit rate along with the average latency of a lookup and of a model call on a miss."""
+
+    with _stats_lock:
+        stats = dict(semantic_cache_stats)
+
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "hit_rate": stats["hits"] / lookups if lookups else 0,
+        "avg_lookup_latency": stats["lookup_latency"] / lookups if lookups else 0,
+        "avg_model_latency": stats["model_latency"] / stats["model_calls"] if stats["model_calls"] else 0,
+    }
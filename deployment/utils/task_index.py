@@ -0,0 +1,186 @@
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Optional
+
+import numpy as np
+
+from utils.intents import tokenize
+from utils.urgency import parse_duration
+
+import settings
+
+
+def embed_task_names(task_names: list[str]) -> np.ndarray:
+    """
+        Embeds task names by hashing their words and word pairs into signed buckets,
+        rows are normalized so the dot product is the cosine similarity.
+    """
+
+    vectors = np.zeros((len(task_names), settings.TASK_INDEX_DIMENSIONS), dtype=np.float32)
+    for row, task_name in enumerate(task_names):
+        tokens = tokenize(task_name)
+        for feature in tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]:
+            bucket = zlib.crc32(feature.encode())
+            vectors[row, bucket % settings.TASK_INDEX_DIMENSIONS] += 1.0 if bucket & 0x80000000 else -1.0
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _index_base(user_profile_pk: str) -> Optional[str]:
+    """Returns the path prefix of the index files of the user, `None` for unexpected keys."""
+
+    if not str(user_profile_pk).isalnum():
+        return None
+
+    return os.path.join(settings.TASK_INDEX_DIR, str(user_profile_pk))
+
+
+def load_index(user_profile_pk: str) -> tuple[Optional[dict], Optional[np.ndarray]]:
+    """
+        Returns the tasks of the user and their embeddings memory-mapped from disk.
+        The tasks name the version of the matrix they were written with, so a reader
+        never pairs them with the matrix of another rebuild.
+    """
+
+    base = _index_base(user_profile_pk)
+    if base is None:
+        return None, None
+
+    try:
+        with open(f"{base}.json") as file:
+            index = json.load(file)
+        vectors = np.load(f"{base}.{index['version']}.npy", mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+    if vectors.shape != (len(index["tasks"]), settings.TASK_INDEX_DIMENSIONS):
+        return None, None
+
+    return index, vectors
+
+
+def is_index_fresh(user_profile_pk: str) -> bool:
+    """Returns whether the index of the user was rebuilt within `TASK_INDEX_MAX_AGE_HOURS`."""
+
+    index, _ = load_index(user_profile_pk)
+    return index is not None and time.time() - index["updated_at"] <= settings.TASK_INDEX_MAX_AGE_HOURS * 3600
+
+
+def find_similar_tasks(user_profile_pk: str, task_names: list[str]) -> Optional[dict]:
+    """
+        Returns the historical tasks most similar to the task names in the same shape
+        as the response of the estimation API. Returns `None` when the index is
+        missing, too small or too old, the API should be asked instead.
+    """
+
+    index, vectors = load_index(user_profile_pk)
+    if index is None or not task_names or len(index["tasks"]) < settings.TASK_INDEX_MIN_TASKS:
+        return None
+    if time.time() - index["updated_at"] > settings.TASK_INDEX_MAX_AGE_HOURS * 3600:
+        return None
+
+    # A historical task is as similar as its closest task name
+    scores = (vectors @ embed_task_names(task_names).T).max(axis=1)
+    order = np.argsort(-scores, kind="stable")[:settings.TASK_INDEX_SIMILAR_TASK_COUNT]
+
+    return {
+        "target_task_names": task_names,
+        "similar_task_names": [index["tasks"][i] for i in order],
+        "years_of_experience": index["years_of_experience"],
+    }
+
+
+def _write_atomically(path: str, write):
+    with tempfile.NamedTemporaryFile(dir=settings.TASK_INDEX_DIR, delete=False) as file:
+        write(file)
+    os.replace(file.name, path)
+
+
+def rebuild_index(user_profile_pk: str, completed_tasks: list[dict], years_of_experience=None):
+    """
+        Replaces the index of the user with their completed tasks, newest first as
+        returned by the API. Durations are given as seconds or "[D ]HH:MM:SS" and are
+        stored in hours like the durations of the estimation API.
+
+        Rebuilds of the same user are serialized with a file lock, so the processes
+        sharing `TASK_INDEX_DIR` do not interleave their writes.
+    """
+
+    base = _index_base(user_profile_pk)
+    if base is None:
+        return
+
+    tasks = []
+    for task in completed_tasks or []:
+        name, hours = str(task.get("name") or "").strip(), parse_duration(task.get("duration")) / 3600
+        if name and hours > 0:
+            tasks.append({"name": name, "duration": round(hours, 2)})
+    tasks = tasks[:settings.TASK_INDEX_MAX_TASKS]
+
+    version = uuid.uuid4().hex
+    index = {
+        "version": version,
+        "updated_at": time.time(),
+        "years_of_experience": years_of_experience,
+        "tasks": tasks,
+    }
+
+    try:
+        os.makedirs(settings.TASK_INDEX_DIR, exist_ok=True)
+        with open(f"{base}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            # The matrix is written under a new name first, the tasks then point readers to it
+            _write_atomically(f"{base}.{version}.npy", lambda file: np.save(file, embed_task_names(
+                [task["name"] for task in tasks])))
+            _write_atomically(f"{base}.json", lambda file: file.write(json.dumps(index).encode()))
+
+            # Readers that already mapped an old matrix keep it until they are done
+            for path in glob.glob(f"{base}.*.npy"):
+                if path != f"{base}.{version}.npy":
+                    os.remove(path)
+    except OSError as e:
+        print(f"Task index update failed: {e}")
+
+
+_rebuild_executor = ThreadPoolExecutor(max_workers=1)
+_rebuilding = set()
+_rebuilding_lock = Lock()
+
+
+def schedule_rebuild(user_profile_pk: str, fetch_tasks: Callable[[], list], years_of_experience=None) -> bool:
+    """
+        Rebuilds the index of the user in the background with the completed tasks
+        returned by `fetch_tasks`, so the request that found the index stale does not
+        wait for the task history. Returns `False` when a rebuild of the user is
+        already queued.
+    """
+
+    with _rebuilding_lock:
+        if user_profile_pk in _rebuilding:
+            return False
+        _rebuilding.add(user_profile_pk)
+
+    def rebuild():
+        try:
+            # An empty history is most likely a failed request, the index is left as is
+            completed_tasks = fetch_tasks()
+            if completed_tasks:
+                rebuild_index(user_profile_pk, completed_tasks, years_of_experience)
+        except Exception as e:
+            print(f"Task index rebuild failed: {e}")
+        finally:
+            with _rebuilding_lock:
+                _rebuilding.discard(user_profile_pk)
+
+    _rebuild_executor.submit(rebuild)
+    return True
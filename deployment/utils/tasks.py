@@ -6,7 +6,8 @@ from langchain_core.tools import tool
 # Import utils
 from api.bposeats import fetch_tasks_due
 from utils.configuration import Configuration
-from utils.models import models
+from utils.models import get_cached_model, resolve_model
+from utils.urgency import rank_tasks, format_ranked_tasks
 
 
 @tool
@@ -16,7 +17,6 @@ def fetch_most_urgent_task(config: RunnableConfig) -> str:
     configuration = Configuration.from_runnable_config(config)
     user_profile_pk = configuration.user_profile_pk
     workforce_id = configuration.workforce_id
-    node_model = models["tool-calling-model"]
 
     form_data = {
         "workforce_id": workforce_id,
@@ -25,23 +25,9 @@ def fetch_most_urgent_task(config: RunnableConfig) -> str:
     }
 
     api_response = fetch_tasks_due(form_data)
-    tasks = [{
-        "task": res["task"]["title"],
-        "current_duration_worked": res["total_duration"],
-        "is_scheduled_task": res["task"]["is_scheduled_task"],
-        "is_meeting": res["task"]["is_meeting"]
-    } for res in api_response["data"]]
+    ranked_tasks = rank_tasks(api_response["data"], configuration.urgency_weights)
 
-    FORMATTED_TOOL_MESSAGE = (
-        "You are an assistant that helps a user determine which tasks to do first. "
-        "The following are tasks assigned to the user which can also be empty:\n"
-        "{tasks}\n"
-        "These tasks are due today so you must determine which tasks are the most "
-        "urgent given the information."
-    ).format(tasks=tasks)
-    response = node_model.invoke(FORMATTED_TOOL_MESSAGE)
-
-    return response
+    return format_ranked_tasks(ranked_tasks, timezone=configuration.x_timezone)
 
 
 @tool
@@ -51,7 +37,8 @@ def fetch_tasks_to_complete_this_week(config: RunnableConfig) -> str:
     configuration = Configuration.from_runnable_config(config)
     user_profile_pk = configuration.user_profile_pk
     workforce_id = configuration.workforce_id
-    node_model = models["tool-calling-model"]
+    model_name = resolve_model("task_formatter", configuration, silent=True)
+    node_model = get_cached_model(model_name, "tasks_this_week")
 
     form_data = {
         "workforce_id": workforce_id,
@@ -64,14 +51,14 @@ def fetch_tasks_to_complete_this_week(config: RunnableConfig) -> str:
 
     FORMATTED_TOOL_MESSAGE = (
         "You are an assistant designed to help the user stay informed about their "
-        "upcoming responsibilities. Below is a list of tasks currently assigned to "
-        "the user for this week. Note that the list may sometimes be empty:\n"
-        "{tasks}\n"
+        "upcoming responsibilities. The tasks currently assigned to the user for this "
+        "week are listed below. Note that the list may sometimes be empty.\n"
         "If there are more than 20 tasks, highlight only the most critical or "
         "time-sensitive ones, and mention how many were left out. Your goal is to "
         "simply present the tasks in a clear and friendly manner, followed by a "
-        "brief, professional, yet encouraging comment to help keep the user motivated."
+        "brief, professional, yet encouraging comment to help keep the user motivated.\n\n"
+        "Tasks: {tasks}"
     ).format(tasks=tasks)
     response = node_model.invoke(FORMATTED_TOOL_MESSAGE)
 
-    return response
+    return response.content
@@ -0,0 +1,81 @@
+import json
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import MessagesState
+from langgraph.prebuilt import ToolNode
+from langgraph.store.base import BaseStore
+
+from utils.configuration import Configuration
+from utils.tokenizer import get_tokenizer
+
+import settings
+
+
+TRUNCATED_MESSAGE = "\n[Output truncated. The full output is stored under the reference `{reference}`.]"
+
+
+def normalize_tool_output(content) -> str:
+    """
+        Normalizes the content of a tool message into a compact string. Structured
+        outputs are rendered as `key: value` lines instead of raw JSON.
+    """
+
+    if isinstance(content, list):
+        content = "".join(
+            block if isinstance(block, str) else block.get("text", "") for block in content
+        )
+
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return str(content).strip()
+
+    if isinstance(data, dict):
+        return "\n".join(f"{key}: {value}" for key, value in data.items())
+
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_tool_message(message: ToolMessage, store: BaseStore, namespace: tuple) -> ToolMessage:
+    """
+        Compacts a tool message to its content only and caps it to the token limit
+        of its tool. The full output is stored in the store when it gets truncated.
+    """
+
+    content = normalize_tool_output(message.content)
+    token_limit = settings.TOOL_OUTPUT_TOKEN_LIMITS.get(message.name, settings.TOKEN_LIMIT_SMALL)
+
+    tokenizer = get_tokenizer()
+    tokens = tokenizer.encode(content)
+    if len(tokens) > token_limit:
+        reference = message.tool_call_id
+        store.put(namespace, reference, {"tool": message.name, "content": content})
+        content = tokenizer.decode(tokens[:token_limit]) + TRUNCATED_MESSAGE.format(reference=reference)
+
+    return ToolMessage(
+        id=message.id,
+        name=message.name,
+        content=content,
+        tool_call_id=message.tool_call_id,
+        status=message.status
+    )
+
+
+def compacting_tool_node(tools: list):
+    """
+        Creates a node that executes tools the same way as `ToolNode` but compacts
+        the resulting tool messages before they are added to the conversation.
+    """
+
+    tool_node = ToolNode(tools)
+
+    def tool_executor(state: MessagesState, config: RunnableConfig, *, store: BaseStore) -> MessagesState:
+        configuration = Configuration.from_runnable_config(config)
+        namespace = ("tool_outputs", configuration.user_profile_pk)
+
+        result = tool_node.invoke(state, config)
+
+        return {"messages": [compact_tool_message(m, store, namespace) for m in result["messages"]]}
+
+    return tool_executor
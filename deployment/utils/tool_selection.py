@@ -0,0 +1,66 @@
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
+
+from utils.models import embeddings
+
+import settings
+
+
+@lru_cache(maxsize=8)
+def _embed_tools(descriptions: tuple) -> np.ndarray:
+    """Embeds the tool descriptions once per process, rows are normalized."""
+
+    vectors = np.array(embeddings.embed_documents(list(descriptions)))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@lru_cache(maxsize=256)
+def _embed_query(query: str) -> np.ndarray:
+    """Embeds the selection query, repeated queries such as retried turns are not embedded again."""
+
+    vector = np.array(embeddings.embed_query(query))
+    return vector / np.linalg.norm(vector)
+
+
+def selection_query(messages: list) -> str:
+    """Returns the latest user messages, which decide the tools that are relevant."""
+
+    human_turns = [message.text() for message in messages if isinstance(message, HumanMessage) and message.content]
+    return "\n".join(human_turns[-settings.TOOL_SELECTION_HUMAN_TURNS:])
+
+
+def select_tools(tools: list, messages: list, always_on: list = (), top_k: int = settings.TOOL_SELECTION_TOP_K) -> list:
+    """
+        Returns the tools to bind for the conversation: the `top_k` tools whose
+        descriptions are the most similar to the latest user messages, the always-on
+        tools and the tools that were already called in `messages`. Tools keep their
+        original order so the bound models can be reused.
+    """
+
+    always_on_names = {tool.get_name() for tool in always_on}
+    candidates = [tool for tool in tools if tool.get_name() not in always_on_names]
+    query = selection_query(messages)
+
+    if len(candidates) <= top_k or not query:
+        return tools
+
+    try:
+        vectors = _embed_tools(tuple(f"{tool.get_name()}: {tool.description}" for tool in candidates))
+        query_vector = _embed_query(query)
+    except Exception as e:
+        print(f"Tool selection failed, binding every tool: {e}")
+        return tools
+
+    scores = vectors @ query_vector
+    selected = {candidates[index].get_name() for index in np.argsort(-scores)[:top_k]}
+
+    # The tools the model already called stay available to keep the history consistent
+    selected |= {
+        tool_call["name"]
+        for message in messages if isinstance(message, AIMessage)
+        for tool_call in message.tool_calls
+    }
+
+    return [tool for tool in tools if tool.get_name() in selected | always_on_names]
@@ -1,3 +1,118 @@
+from functools import lru_cache
+from typing import Optional
+
+import openai
+from pydantic import BaseModel, ValidationError
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableConfig
+from trustcall import create_extractor
+
+from utils.models import models, SilentHandler
+
+
+# JSON schema keywords that OpenAI does not accept in strict mode
+STRICT_UNSUPPORTED_KEYWORDS = ("default", "example", "examples")
+
+EXISTING_DOCUMENT_MESSAGE = (
+    "The current state of the {schema_name} is shown below. Keep its values unless the "
+    "conversation changes them:\n"
+    "{existing}"
+)
+
+
+@lru_cache(maxsize=32)
+def _build_extractor(model_name: str, tools: tuple, tool_choice: Optional[str],
+                     enable_inserts: bool, enable_deletes: bool):
+    return create_extractor(
+        models[model_name],
+        tools=list(tools),
+        tool_choice=tool_choice,
+        enable_inserts=enable_inserts,
+        enable_deletes=enable_deletes
+    )
+
+
+def get_extractor(model_name: str, tools: list, tool_choice: Optional[str] = None,
+                  enable_inserts: bool = False, enable_deletes: bool = False):
+    """
+        Returns a Trustcall extractor. Extractors are compiled graphs, so they are
+        only built once per combination of model, schemas and options.
+    """
+    return _build_extractor(model_name, tuple(tools), tool_choice, enable_inserts, enable_deletes)
+
+
+def strict_json_schema(schema: dict) -> dict:
+    """
+        Converts a JSON schema to one accepted by OpenAI's strict structured output:
+        every property is required (optional ones stay nullable), no additional
+        properties are allowed, and unsupported keywords are dropped.
+    """
+
+    if isinstance(schema, list):
+        return [strict_json_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+
+    strict_schema = {}
+    for keyword, value in schema.items():
+        if keyword in STRICT_UNSUPPORTED_KEYWORDS:
+            continue
+        if keyword in ("properties", "$defs"):
+            strict_schema[keyword] = {name: strict_json_schema(item) for name, item in value.items()}
+        else:
+            strict_schema[keyword] = strict_json_schema(value)
+
+    if strict_schema.get("type") == "object":
+        strict_schema["required"] = list(strict_schema.get("properties", {}))
+        strict_schema["additionalProperties"] = False
+
+    return strict_schema
+
+
+@lru_cache(maxsize=32)
+def _build_strict_model(model_name: str, schema: type[BaseModel]):
+    response_format = {
+        "name": schema.__name__,
+        "schema": strict_json_schema(schema.model_json_schema()),
+        "strict": True
+    }
+    return models[model_name].with_structured_output(response_format, method="json_schema")
+
+
+def extract_structured(model_name: str, schema: type[BaseModel], messages: list,
+                       existing: Optional[BaseModel] = None, config: Optional[RunnableConfig] = None,
+                       **extractor_options) -> BaseModel:
+    """
+        Extracts a flat schema with a single strict structured output call. Trustcall is
+        only used as a fallback when the output fails validation. `extractor_options`
+        are passed to the Trustcall extractor.
+
+        The raw output is never meant for the user, so the calls do not inherit the
+        callbacks of the run unless a `config` is given.
+    """
+
+    config = config or {"callbacks": [SilentHandler()]}
+    schema_name = schema.__name__
+    prompt = list(messages)
+    if existing is not None:
+        prompt.append(SystemMessage(content=EXISTING_DOCUMENT_MESSAGE.format(
+            schema_name=schema_name, existing=existing.model_dump_json())))
+
+    try:
+        return schema.model_validate(_build_strict_model(model_name, schema).invoke(prompt, config))
+    except (ValidationError, OutputParserException, openai.BadRequestError) as e:
+        print(f"Strict extraction of {schema_name} failed, falling back to Trustcall: {e}")
+
+    extractor = get_extractor(model_name, [schema], tool_choice=schema_name, **extractor_options)
+    extractor_input = {"messages": messages}
+    if existing is not None:
+        extractor_input["existing"] = {schema_name: existing}
+
+    result = extractor.invoke(extractor_input, config)
+    return result["responses"][0]
+
+
 class Spy:
     """
         Inspect the tool calls for Trustcall
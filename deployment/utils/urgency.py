@@ -0,0 +1,122 @@
+from datetime import datetime
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import settings
+
+
+def parse_duration(value) -> float:
+    """Returns the seconds of a duration given in seconds or as "[D ]HH:MM:SS"."""
+
+    if not value:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    try:
+        days, _, clock = str(value).strip().rpartition(" ")
+        seconds = 0.0
+        for part in clock.split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds + float(days or 0) * 86400
+    except ValueError:
+        return 0.0
+
+
+def parse_datetime(value) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")) if value else None
+    except ValueError:
+        return None
+
+
+def hours_until(moment: Optional[datetime]) -> float:
+    """Returns the hours left until the moment, or NaN when it is unknown."""
+
+    if moment is None:
+        return np.nan
+    return (moment - datetime.now(moment.tzinfo)).total_seconds() / 3600
+
+
+def format_duration(seconds: float) -> str:
+    hours, minutes = divmod(int(seconds) // 60, 60)
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
+
+
+def rank_tasks(task_assignments: list, weights: Optional[dict] = None) -> list[dict]:
+    """
+        Scores the task assignments returned by the API and returns them from the most
+        to the least urgent. Each feature is scaled to [0, 1] and weighted by
+        `settings.URGENCY_WEIGHTS`, which `weights` can override.
+    """
+
+    if not task_assignments:
+        return []
+
+    weights = {**settings.URGENCY_WEIGHTS, **(weights or {})}
+    tasks = [assignment["task"] for assignment in task_assignments]
+
+    worked = np.array([parse_duration(assignment.get("total_duration")) for assignment in task_assignments])
+    is_meeting = np.array([bool(task.get("is_meeting")) for task in tasks], dtype=float)
+    is_scheduled = np.array([bool(task.get("is_scheduled_task")) for task in tasks], dtype=float)
+    due_dates = [parse_datetime(task.get("due_date")) for task in tasks]
+    hours_to_due = np.array([hours_until(due_date) for due_date in due_dates])
+    hours_since_created = -np.array([hours_until(parse_datetime(task.get("date_created"))) for task in tasks])
+
+    # Overdue tasks score 1 and tasks without a due time sit in the middle of the day
+    due_soon = np.where(np.isnan(hours_to_due), 0.5, 1 - np.clip(hours_to_due / 24, 0, 1))
+    age = np.nan_to_num(np.clip(hours_since_created / (24 * 30), 0, 1))
+
+    scores = (
+        weights["is_meeting"] * is_meeting
+        + weights["is_scheduled_task"] * is_scheduled
+        + weights["due_soon"] * due_soon
+        + weights["in_progress"] * (worked > 0)
+        + weights["age"] * age
+    )
+
+    # Stable sort keeps the API order, newest first, between equal scores
+    order = np.argsort(-scores, kind="stable")
+    return [
+        {
+            "task": tasks[i]["title"],
+            "score": round(float(scores[i]), 2),
+            "is_meeting": bool(is_meeting[i]),
+            "is_scheduled_task": bool(is_scheduled[i]),
+            "due_date": due_dates[i],
+            "worked": worked[i],
+        }
+        for i in order
+    ]
+
+
+def format_ranked_tasks(
+        ranked_tasks: list[dict], limit: int = settings.URGENCY_TASK_LIMIT, timezone: Optional[str] = None) -> str:
+    """Renders the ranked tasks as a compact numbered list, due times are shown in `timezone`."""
+
+    if not ranked_tasks:
+        return "The user has no tasks due today."
+
+    lines = ["Tasks due today, most urgent first:"]
+    for number, task in enumerate(ranked_tasks[:limit], start=1):
+        details = []
+        if task["is_meeting"]:
+            details.append("meeting")
+        if task["is_scheduled_task"]:
+            details.append("scheduled")
+        if task["due_date"]:
+            due_date = task["due_date"]
+            if timezone and due_date.tzinfo:
+                due_date = due_date.astimezone(ZoneInfo(timezone))
+            details.append(f"due {due_date:%H:%M}")
+        if task["worked"]:
+            details.append(f"{format_duration(task['worked'])} worked")
+
+        lines.append(f"{number}. {task['task']}" + (f" ({', '.join(details)})" if details else ""))
+
+    if len(ranked_tasks) > limit:
+        lines.append(f"...and {len(ranked_tasks) - limit} more tasks due today.")
+
+    return "\n".join(lines)